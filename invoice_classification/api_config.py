@@ -5,135 +5,175 @@ Defines which API provider and mailbox to use for each supplier.
 """
 
 import os
-import json
+import sys
+from enum import IntEnum
 from pathlib import Path
-from dataclasses import dataclass
-from typing import Optional
+from types import MappingProxyType
+from typing import Iterable, NamedTuple, Optional
+
+# Optional: msgspec decodes JSON faster and with fewer allocations than stdlib json
+try:
+    from msgspec import DecodeError as _JSONDecodeError
+    from msgspec.json import decode as _json_loads
+except ImportError:
+    from json import JSONDecodeError as _JSONDecodeError
+    from json import loads as _json_loads
 
 # Load config from file
 CONFIG_FILE = Path(__file__).parent / 'config.json'
 
-def _load_config() -> dict:
-    """Load configuration from config.json file."""
-    if CONFIG_FILE.exists():
-        try:
-            with open(CONFIG_FILE, 'r') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            return {}
-    return {}
+# Last successfully parsed config and the config.json mtime it was checked at.
+# Reused until the file changes; also served while config.json is unreadable.
+_CACHED_CONFIG: Optional[dict] = None
+_config_mtime_ns: Optional[int] = None
+
+
+def refresh_config() -> dict:
+    """
+    Re-read config.json, keeping the last good configuration on failure.
+
+    Returns:
+        The current configuration dict
+    """
+    global _CACHED_CONFIG, _config_mtime_ns
+    try:
+        _config_mtime_ns = CONFIG_FILE.stat().st_mtime_ns
+        # Single read of the whole file; the bytes are decoded in C
+        config = _json_loads(CONFIG_FILE.read_bytes())
+    except (OSError, _JSONDecodeError):
+        # Transient read/parse failure - keep serving the stale config
+        if _CACHED_CONFIG is None:
+            _CACHED_CONFIG = {}
+        return _CACHED_CONFIG
+
+    _CACHED_CONFIG = config
+    return config
+
+
+def _config() -> dict:
+    """Return the parsed config, re-reading config.json only when its mtime changes."""
+    if _CACHED_CONFIG is None:
+        return refresh_config()
+    try:
+        mtime_ns = CONFIG_FILE.stat().st_mtime_ns
+    except OSError:
+        return _CACHED_CONFIG
+    if mtime_ns != _config_mtime_ns:
+        return refresh_config()
+    return _CACHED_CONFIG
 
-_config = _load_config()
 
 # API Keys - load from config file, fallback to environment variable
-PARSEUR_API_KEY = _config.get('parseur', {}).get('api_key', '') or os.environ.get('PARSEUR_API_KEY', '')
-DOCUPIPE_API_KEY = _config.get('docupipe', {}).get('api_key', '') or os.environ.get('DOCUPIPE_API_KEY', '')
+def _api_key(section: str, env_var: str) -> str:
+    """Get an API key from config.json, falling back to the environment."""
+    section_config = _config().get(section)
+    if section_config:
+        api_key = section_config.get('api_key')
+        if api_key:
+            return api_key
+    return os.environ.get(env_var, '')
+
+
+def get_parseur_key() -> str:
+    """Get the Parseur API key."""
+    return _api_key('parseur', 'PARSEUR_API_KEY')
+
+
+def get_docupipe_key() -> str:
+    """Get the Docupipe API key."""
+    return _api_key('docupipe', 'DOCUPIPE_API_KEY')
+
 
 # API endpoints
 PARSEUR_BASE_URL = "https://api.parseur.com"
 DOCUPIPE_BASE_URL = "https://app.docupipe.ai"
 
 
-@dataclass
-class APIRoute:
+class Provider(IntEnum):
+    """OCR API providers that documents can be routed to."""
+    PARSEUR = 0
+    DOCUPIPE = 1
+
+    def __str__(self) -> str:
+        return self.name.lower()
+
+
+# Provider singletons - compare with `is` when dispatching on route.provider
+PROVIDER_PARSEUR = Provider.PARSEUR
+PROVIDER_DOCUPIPE = Provider.DOCUPIPE
+
+
+class APIRoute(NamedTuple):
     """Configuration for routing a supplier's invoices to an OCR API."""
-    provider: str  # 'parseur', 'docupipe', etc.
+    provider: Provider
     mailbox_id: Optional[str] = None  # For Parseur
     workflow_id: Optional[str] = None  # For Docupipe
     enabled: bool = True
 
 
-# Supplier to API routing table
-# Original invoice suppliers -> Parseur
-SUPPLIER_ROUTES = {
-    'soares': APIRoute(provider='parseur', mailbox_id='111948'),
-    'justdrinks': APIRoute(provider='parseur', mailbox_id='112442'),
-    'novadis': APIRoute(provider='parseur', mailbox_id='111943'),
-    'garcias': APIRoute(provider='parseur', mailbox_id='112445'),
-    'teofilo': APIRoute(provider='parseur', mailbox_id='112431'),
-    'jmv': APIRoute(provider='parseur', mailbox_id='112446'),
-    'absolutlyvintage': APIRoute(provider='parseur', mailbox_id='112448'),
-    # All receipts and other documents -> Docupipe
-    'magniberia': APIRoute(provider='docupipe'),
-    'teofilo_gd': APIRoute(provider='docupipe'),  # Teófilo return guides
-    'teofilo_nc': APIRoute(provider='docupipe'),  # Teófilo credit notes
-    # Supermarkets
-    'intermarche': APIRoute(provider='docupipe'),
-    'continente': APIRoute(provider='docupipe', workflow_id='4Vy92EQH'),
-    'overseas': APIRoute(provider='docupipe'),
-    'makro': APIRoute(provider='docupipe', workflow_id='jtVquUzt'),
-    'pingodoce': APIRoute(provider='docupipe', workflow_id='PRtYtwC7'),
-    'lidl': APIRoute(provider='docupipe', workflow_id='YxiR0kCy'),
-    'inframoura': APIRoute(provider='docupipe', workflow_id='y2c7v2bS'),
-    # Gas stations
-    'moeve': APIRoute(provider='docupipe'),
-    'galp': APIRoute(provider='docupipe'),
-    'cepsa': APIRoute(provider='docupipe'),
-    'makro_gas': APIRoute(provider='docupipe'),
-    'bp': APIRoute(provider='docupipe'),
-    # Retail stores
-    'action': APIRoute(provider='docupipe'),
-    'worten': APIRoute(provider='docupipe'),
-    'wells': APIRoute(provider='docupipe'),
-    'ikea': APIRoute(provider='docupipe'),
-    'leroy': APIRoute(provider='docupipe'),
-    'staples': APIRoute(provider='docupipe'),
-    'note': APIRoute(provider='docupipe'),
-    'partyland': APIRoute(provider='docupipe'),
-    'kiabi': APIRoute(provider='docupipe'),
-    # Hardware/supplies
-    'constamarina': APIRoute(provider='docupipe'),
-    'constantino': APIRoute(provider='docupipe'),
-    'papelnet': APIRoute(provider='docupipe'),
-    'gildadasilva': APIRoute(provider='docupipe'),
-    'robalo': APIRoute(provider='docupipe', workflow_id='kjigWqyQ'),
-    # Fast food
-    'burgerking': APIRoute(provider='docupipe'),
-    'mcdonalds': APIRoute(provider='docupipe'),
-    'pizzahut': APIRoute(provider='docupipe'),
-    'dominos': APIRoute(provider='docupipe'),
-    # Restaurants
-    'mourapao': APIRoute(provider='docupipe'),
-    'matchpoint': APIRoute(provider='docupipe'),
-    'osakasushi': APIRoute(provider='docupipe'),
-    'tribulum': APIRoute(provider='docupipe'),
-    'zorba': APIRoute(provider='docupipe'),
-    'sinfonia': APIRoute(provider='docupipe'),
-    'eurolatina': APIRoute(provider='docupipe'),
-    'apaisagem': APIRoute(provider='docupipe'),
-    'anticapizzeria': APIRoute(provider='docupipe'),
-    'italianrepublic': APIRoute(provider='docupipe'),
-    'reichurrasco': APIRoute(provider='docupipe'),
-    'solarfarelo': APIRoute(provider='docupipe'),
-    'botanico': APIRoute(provider='docupipe'),
-    'adegamonte': APIRoute(provider='docupipe'),
-    'afamilia': APIRoute(provider='docupipe'),
-    'artisan': APIRoute(provider='docupipe'),
-    'bagga': APIRoute(provider='docupipe'),
-    'maxidrive': APIRoute(provider='docupipe'),
-    'padoca': APIRoute(provider='docupipe'),
-    # Shopping/other
-    'seminoshopping': APIRoute(provider='docupipe'),
-    'orientalshopping': APIRoute(provider='docupipe'),
-    'shoppingloule': APIRoute(provider='docupipe'),
-    'a4tabacaria': APIRoute(provider='docupipe'),
-    # Tolls/parking
-    'brisa': APIRoute(provider='docupipe'),
-    'brisatoll': APIRoute(provider='docupipe'),
-    'alparques': APIRoute(provider='docupipe'),
-}
+# Supplier to API routing table, grouped by provider:
+# {"parseur": {"soares": {"mailbox_id": "..."}}, "docupipe": {"lidl": {"workflow_id": "..."}}}
+ROUTES_FILE = Path(__file__).parent / 'supplier_routes.json'
+
+
+def _load_routes() -> MappingProxyType:
+    """Load the supplier routing table from supplier_routes.json."""
+    routes = {}
+    for provider_name, suppliers in _json_loads(ROUTES_FILE.read_bytes()).items():
+        provider = Provider[provider_name.upper()]
+        # Suppliers with no mailbox/workflow all share one route instance
+        default_route = APIRoute(provider=provider)
+        for supplier, options in suppliers.items():
+            routes[sys.intern(supplier)] = APIRoute(provider=provider, **options) if options else default_route
+    # Read-only view: routes are immutable tuples shared by every caller
+    return MappingProxyType(routes)
+
+
+SUPPLIER_ROUTES = _load_routes()
 
 
 def get_route(supplier: str) -> Optional[APIRoute]:
     """Get the API route configuration for a supplier."""
+    # Classifier supplier names are already lowercase, so try them as-is
+    # before paying for a lowercased copy
+    route = SUPPLIER_ROUTES.get(supplier)
+    if route is not None:
+        return route
     return SUPPLIER_ROUTES.get(supplier.lower())
 
 
+def get_routes(suppliers: Iterable[str]) -> list[Optional[APIRoute]]:
+    """Get the API route configuration for each supplier, in order."""
+    get = SUPPLIER_ROUTES.get
+    return [get(supplier) or get(supplier.lower()) for supplier in suppliers]
+
+
+def route_error(route: Optional[APIRoute], supplier: str, provider: Provider) -> Optional[str]:
+    """
+    Check that a supplier's route can be used to upload to a provider.
+
+    Args:
+        route: The supplier's route (from get_route)
+        supplier: Supplier name, for the error message
+        provider: Provider the caller uploads to
+
+    Returns:
+        Error message, or None if the route is usable
+    """
+    if route is None:
+        return f"No API route configured for supplier: {supplier}"
+    if not route.enabled:
+        return f"API route for {supplier} is disabled (provider: {route.provider})"
+    if route.provider is not provider:
+        return f"Supplier {supplier} uses provider '{route.provider}', not {provider}"
+    return None
+
+
 def is_parseur_configured() -> bool:
     """Check if Parseur API key is configured."""
-    return bool(PARSEUR_API_KEY)
+    return bool(get_parseur_key())
 
 
 def is_docupipe_configured() -> bool:
     """Check if Docupipe API key is configured."""
-    return bool(DOCUPIPE_API_KEY)
+    return bool(get_docupipe_key())
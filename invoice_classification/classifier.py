@@ -4,12 +4,21 @@ Invoice Classification System
 Classifies scanned invoices by supplier to route to appropriate OCR APIs.
 """
 
+import copy
+import hashlib
+import itertools
+import json
 import os
 import re
 import shutil
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from dataclasses import dataclass, field
-from typing import Optional
+from dataclasses import dataclass, field, replace
+from functools import lru_cache, partial
+from typing import Callable, Iterator, Optional
 from datetime import datetime
 import logging
 
@@ -19,23 +28,124 @@ import cv2
 import numpy as np
 from PIL import Image
 
+# Optional: PyMuPDF renders pages in-process, without a pdftoppm subprocess
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
 # OCR
 import pytesseract
 
+# Optional: tesserocr keeps libtesseract (and the language model) loaded in-process
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
 # For template matching / feature extraction
 from skimage.metrics import structural_similarity as ssim
 
+# Optional: Hyperscan matches all supplier keywords in a single pass over the text
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+# API routing (optional: classification works without the upload integration)
+try:
+    from api_config import PROVIDER_DOCUPIPE, PROVIDER_PARSEUR, get_route
+except ImportError:
+    get_route = None
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Portuguese month abbreviations
+_PT_MONTHS = r'(jan|fev|mar|abr|mai|jun|jul|ago|set|out|nov|dez)'
+
+# Portuguese month abbreviations mapping
+_PT_MONTH_NUMBERS = {
+    'jan': 1, 'fev': 2, 'mar': 3, 'abr': 4, 'mai': 5, 'jun': 6,
+    'jul': 7, 'ago': 8, 'set': 9, 'out': 10, 'nov': 11, 'dez': 12
+}
+
+# Longest day of each month (index 1-12; February allows the 29th)
+_DAYS_IN_MONTH = (0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+# Common date patterns (order matters - more specific patterns first),
+# with the literals a text must contain (any of them) for the pattern to match
+_DATE_PATTERNS = [
+    # Portuguese month format: 30 - set - 2025 or 30 - set 2025 or 30-set-25
+    (re.compile(rf'(\d{{1,2}})\s*[-–]\s*{_PT_MONTHS}\s*[-–]?\s*(\d{{2,4}})'), 'pt_month', tuple(_PT_MONTH_NUMBERS)),
+    # ISO format with dashes: 2025-02-10
+    (re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})'), 'ymd', ('-',)),
+    # ISO format with slashes: 2025/02/10
+    (re.compile(r'(\d{4})/(\d{1,2})/(\d{1,2})'), 'ymd', ('/',)),
+    # European/US format with slashes: 10/02/2025 or 2/16/2025
+    (re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})'), 'ambiguous', ('/',)),
+    # European format with dashes: 10-02-2025
+    (re.compile(r'(\d{1,2})-(\d{1,2})-(\d{4})'), 'dmy', ('-',)),
+    # European format with dots: 10.02.2025
+    (re.compile(r'(\d{1,2})\.(\d{1,2})\.(\d{4})'), 'dmy', ('.',)),
+]
+
+# Priority keywords for invoice ISSUE date (highest priority first)
+_PRIORITY_KEYWORDS = [
+    re.compile(r'data\s*(?:de\s*)?emiss[ãa]o\s*[:\s]*'),
+    re.compile(r'data\s*(?:do\s*)?documento\s*[:\s]*'),
+    re.compile(r'data\s*(?:da\s*)?fact?ura\s*[:\s]*'),
+    re.compile(r'emitido\s*(?:em|a)?\s*[:\s]*'),
+]
+
+# Keywords to AVOID (these are due dates, not issue dates), as one alternation
+_AVOID_KEYWORDS_RE = re.compile(r'vencimento|pagamento|prazo')
+
+# Tesseract settings: LSTM engine only (--oem 1), no dictionary word lists
+# (they "correct" NIFs, postcodes and supplier names towards dictionary
+# words) and no inverted-text pass (invoices are dark text on white)
+_TESSERACT_OEM = 1
+_TESSERACT_VARIABLES = {'load_system_dawg': 'F', 'load_freq_dawg': 'F', 'tessedit_do_invert': '0'}
+_TESSERACT_CONFIG = f'--oem {_TESSERACT_OEM} ' + ' '.join(
+    f'-c {name}={value}' for name, value in _TESSERACT_VARIABLES.items()
+)
+
+# Characters that make a keyword a regex rather than plain text
+_REGEX_METACHARS = frozenset('.^$*+?{}[]\\|()')
+
+# NIF candidates: 9 digits, plain (501496912) or spaced (501 496 912).
+# Zero-width lookahead so overlapping candidates inside longer digit runs
+# are all found, like a substring search would.
+_NIF_RE = re.compile(r'(?=(\d{3}(?: \d{3} |\d{3})\d{3}))')
+
+
+@lru_cache(maxsize=1)
+def _pytesseract_lang() -> Optional[str]:
+    """
+    Pick the language for pytesseract calls, checking once per process.
 
-@dataclass
+    Returns:
+        'por' if the Portuguese model is installed, otherwise None (default)
+    """
+    # Use Portuguese language for better accuracy
+    if 'por' in pytesseract.get_languages():
+        return 'por'
+    # Fallback to default if Portuguese not available
+    logger.warning("Tesseract Portuguese model not installed, using default language")
+    return None
+
+
+class _PDFConversionError(Exception):
+    """PDF could not be rendered; raised inside the classify cache so it is not stored."""
+
+
+@dataclass(frozen=True, slots=True)
 class SupplierProfile:
     """Profile for a known supplier."""
     name: str
     display_name: str
     nif: str  # Portuguese tax ID
-    keywords: list[str]  # Unique text patterns to look for
+    keywords: tuple[str, ...]  # Unique text patterns to look for (lowercase, matched against lowercased text)
     logo_template: Optional[np.ndarray] = None  # Reference logo image
     header_region: tuple[int, int, int, int] = (0, 0, 800, 300)  # x, y, w, h for logo area
 
@@ -65,56 +175,56 @@ class InvoiceClassifier:
             name='teofilo',
             display_name='Estabelecimentos Teófilo Fontainhas Neto',
             nif='500099871',
-            keywords=['teofilo', 'fontainhas', 'messines', '8375-127', 'teofilo.pt'],
+            keywords=('teofilo', 'fontainhas', 'messines', '8375-127', 'teofilo.pt'),
             header_region=(0, 0, 400, 150),  # Logo is top-left
         ),
         'soares': SupplierProfile(
             name='soares',
             display_name='Garrafeira Soares',
             nif='501496912',
-            keywords=['soares', 'garrafeira', 'wine.*spirits', '40.*anos', 'garrafeirasoares.pt'],
+            keywords=('soares', 'garrafeira', 'wine.*spirits', '40.*anos', 'garrafeirasoares.pt'),
             header_region=(0, 0, 300, 150),
         ),
         'garcias': SupplierProfile(
             name='garcias',
             display_name='Garcias S.A.',
             nif='501141243',
-            keywords=['garcias', 'wines.*spirits', 'algoz', '8365-085', 'garcias.pt'],
+            keywords=('garcias', 'wines.*spirits', 'algoz', '8365-085', 'garcias.pt'),
             header_region=(0, 0, 300, 150),
         ),
         'jmv': SupplierProfile(
             name='jmv',
             display_name='Jose Maria Vieira S.A.',
             nif='503858471',
-            keywords=['jose.*maria.*vieira', 'rio.*tinto', '4439-909'],
+            keywords=('jose.*maria.*vieira', 'rio.*tinto', '4439-909'),
             header_region=(0, 0, 400, 100),
         ),
         'justdrinks': SupplierProfile(
             name='justdrinks',
             display_name='Justdrinks Lda',
             nif='508976464',
-            keywords=['justdrinks', 'quatro.*estradas', '8100-287', 'justdrinks.pt'],
+            keywords=('justdrinks', 'quatro.*estradas', '8100-287', 'justdrinks.pt'),
             header_region=(0, 0, 300, 200),
         ),
         'novadis': SupplierProfile(
             name='novadis',
             display_name='Novadis Unipessoal Lda',
             nif='504350900',
-            keywords=['novadis', 'alfarrobeira', 'vila.*franca.*xira', 'centralcervejas'],
+            keywords=('novadis', 'alfarrobeira', 'vila.*franca.*xira', 'centralcervejas'),
             header_region=(0, 0, 400, 100),
         ),
         'absolutlyvintage': SupplierProfile(
             name='absolutlyvintage',
             display_name='Absolutly Vintage Unipessoal Lda',
             nif='516001906',
-            keywords=['absolutly.*vintage', 'alcantarilha', '8365-028', 'rogel'],
+            keywords=('absolutly.*vintage', 'alcantarilha', '8365-028', 'rogel'),
             header_region=(0, 0, 300, 200),
         ),
         'magniberia': SupplierProfile(
             name='magniberia',
             display_name='Magnibéria Ltd. (VENKO Solutions)',
             nif='515102334',
-            keywords=['magniberia', 'venko', 'tavira', '8800-318', 'magniberia.pt'],
+            keywords=('magniberia', 'venko', 'tavira', '8800-318', 'magniberia.pt'),
             header_region=(0, 0, 300, 150),
         ),
         # Teófilo return guides (Guia de Devolução) - same company, different document type
@@ -122,14 +232,14 @@ class InvoiceClassifier:
             name='teofilo_gd',
             display_name='Teófilo - Guia de Devolução',
             nif='500099871',  # Same NIF as teofilo
-            keywords=['guia.*devolu', 'produto.*reclamado', 'produto.*devolvido'],
+            keywords=('guia.*devolu', 'produto.*reclamado', 'produto.*devolvido'),
             header_region=(0, 0, 400, 150),
         ),
         'teofilo_nc': SupplierProfile(
             name='teofilo_nc',
             display_name='Teófilo - Nota de Crédito',
             nif='500099871',  # Same NIF as teofilo
-            keywords=['nota.*cr[ée]dito', 'c\\s*caau'],
+            keywords=('nota.*cr[ée]dito', 'c\\s*caau'),
             header_region=(0, 0, 400, 150),
         ),
         # === RECEIPTS (Docupipe) ===
@@ -137,371 +247,371 @@ class InvoiceClassifier:
             name='intermarche',
             display_name='Intermarché / Sodiquarteira',
             nif='508162378',
-            keywords=['intermarche', 'sodiquarteira', 'vilamoura', 'supermercados'],
+            keywords=('intermarche', 'sodiquarteira', 'vilamoura', 'supermercados'),
             header_region=(0, 0, 400, 150),
         ),
         'continente': SupplierProfile(
             name='continente',
             display_name='Continente Hipermercados',
             nif='502011475',
-            keywords=['continente', 'hipermercados', 'sonae'],
+            keywords=('continente', 'hipermercados', 'sonae'),
             header_region=(0, 0, 400, 150),
         ),
         'moeve': SupplierProfile(
             name='moeve',
             display_name='Moeve (Galp Tolls)',
             nif='500223840',
-            keywords=['moeve', 'operacoes.*retalho'],
+            keywords=('moeve', 'operacoes.*retalho'),
             header_region=(0, 0, 400, 150),
         ),
         'galp': SupplierProfile(
             name='galp',
             display_name='Galp Energia',
             nif='500697370',
-            keywords=['galp', 'petróleos', 'energia'],
+            keywords=('galp', 'petróleos', 'energia'),
             header_region=(0, 0, 400, 150),
         ),
         'cepsa': SupplierProfile(
             name='cepsa',
             display_name='Cepsa / Vilacomb',
             nif='510748430',
-            keywords=['cepsa', 'vilacomb', 'combustiveis'],
+            keywords=('cepsa', 'vilacomb', 'combustiveis'),
             header_region=(0, 0, 400, 150),
         ),
         'makro_gas': SupplierProfile(
             name='makro_gas',
             display_name='Makro Gas (Carbusol)',
             nif='505337053',
-            keywords=['carbusol', 'makro.*fetha'],
+            keywords=('carbusol', 'makro.*fetha'),
             header_region=(0, 0, 400, 150),
         ),
         'action': SupplierProfile(
             name='action',
             display_name='Action Store',
             nif='517247739',
-            keywords=['action', 'storeops.*portugal'],
+            keywords=('action', 'storeops.*portugal'),
             header_region=(0, 0, 400, 150),
         ),
         'burgerking': SupplierProfile(
             name='burgerking',
             display_name='Burger King',
             nif='504661264',
-            keywords=['burger.*king', 'whopper'],
+            keywords=('burger.*king', 'whopper'),
             header_region=(0, 0, 400, 150),
         ),
         'mourapao': SupplierProfile(
             name='mourapao',
             display_name='Mourapão / Sailor Corner',
             nif='518468020',
-            keywords=['mourapao', 'sailor.*corner', 'grupo.*mourapao'],
+            keywords=('mourapao', 'sailor.*corner', 'grupo.*mourapao'),
             header_region=(0, 0, 400, 150),
         ),
         'worten': SupplierProfile(
             name='worten',
             display_name='Worten',
             nif='503630330',
-            keywords=['worten', 'equipamentos.*lar'],
+            keywords=('worten', 'equipamentos.*lar'),
             header_region=(0, 0, 400, 150),
         ),
         'wells': SupplierProfile(
             name='wells',
             display_name='Wells Pharmacy',
             nif='508037514',
-            keywords=['wells', 'pharmacontinente'],
+            keywords=('wells', 'pharmacontinente'),
             header_region=(0, 0, 400, 150),
         ),
         'matchpoint': SupplierProfile(
             name='matchpoint',
             display_name='Pizzaria MatchPoint',
             nif='516585800',
-            keywords=['matchpoint', 'premier.*sports'],
+            keywords=('matchpoint', 'premier.*sports'),
             header_region=(0, 0, 400, 150),
         ),
         'overseas': SupplierProfile(
             name='overseas',
             display_name='Overseas Supermercados',
             nif='509943888',
-            keywords=['overseas', 'tavagueira'],
+            keywords=('overseas', 'tavagueira'),
             header_region=(0, 0, 400, 150),
         ),
         'makro': SupplierProfile(
             name='makro',
             display_name='Makro Cash & Carry',
             nif='502030712',
-            keywords=['makro', 'cash.*carry'],
+            keywords=('makro', 'cash.*carry'),
             header_region=(0, 0, 400, 150),
         ),
         'pingodoce': SupplierProfile(
             name='pingodoce',
             display_name='Pingo Doce',
             nif='500829093',
-            keywords=['pingo.*doce', 'distribuição.*alimentar'],
+            keywords=('pingo.*doce', 'distribuição.*alimentar'),
             header_region=(0, 0, 400, 150),
         ),
         'lidl': SupplierProfile(
             name='lidl',
             display_name='Lidl',
             nif='503340855',
-            keywords=['lidl', 'www\\.lidl\\.pt'],
+            keywords=('lidl', 'www\\.lidl\\.pt'),
             header_region=(0, 0, 400, 150),
         ),
         'inframoura': SupplierProfile(
             name='inframoura',
             display_name='Inframoura',
             nif='504915266',
-            keywords=['inframoura', 'águas.*algarve', 'saneamento'],
+            keywords=('inframoura', 'águas.*algarve', 'saneamento'),
             header_region=(0, 0, 400, 150),
         ),
         'constamarina': SupplierProfile(
             name='constamarina',
             display_name='Constamarina',
             nif='504147480',
-            keywords=['constamarina', 'drogaria.*nauticos'],
+            keywords=('constamarina', 'drogaria.*nauticos'),
             header_region=(0, 0, 400, 150),
         ),
         'constantino': SupplierProfile(
             name='constantino',
             display_name='Drogaria Constantino',
             nif='500072205',
-            keywords=['constantino', 'rocha.*amador'],
+            keywords=('constantino', 'rocha.*amador'),
             header_region=(0, 0, 400, 150),
         ),
         'papelnet': SupplierProfile(
             name='papelnet',
             display_name='Papelnet',
             nif='504064282',
-            keywords=['papelnet', 'papelaria'],
+            keywords=('papelnet', 'papelaria'),
             header_region=(0, 0, 400, 150),
         ),
         'osakasushi': SupplierProfile(
             name='osakasushi',
             display_name='Osaka Sushi',
             nif='518794482',
-            keywords=['osaka', 'meridiano.*suculento'],
+            keywords=('osaka', 'meridiano.*suculento'),
             header_region=(0, 0, 400, 150),
         ),
         'tribulum': SupplierProfile(
             name='tribulum',
             display_name='Tribulum Restaurant',
             nif='515892327',
-            keywords=['tribulum', 'all.*over.*mountain'],
+            keywords=('tribulum', 'all.*over.*mountain'),
             header_region=(0, 0, 400, 150),
         ),
         'zorba': SupplierProfile(
             name='zorba',
             display_name='Zorba The Greek',
             nif='518564410',
-            keywords=['zorba', 'meadows.*heaven'],
+            keywords=('zorba', 'meadows.*heaven'),
             header_region=(0, 0, 400, 150),
         ),
         'sinfonia': SupplierProfile(
             name='sinfonia',
             display_name='Sinfonia d\'Iguarias',
             nif='518636766',
-            keywords=['sinfonia', 'iguarias'],
+            keywords=('sinfonia', 'iguarias'),
             header_region=(0, 0, 400, 150),
         ),
         'eurolatina': SupplierProfile(
             name='eurolatina',
             display_name='Eurolatina Bakery',
             nif='502781106',
-            keywords=['eurolatina', 'diniz.*nota.*loureiro'],
+            keywords=('eurolatina', 'diniz.*nota.*loureiro'),
             header_region=(0, 0, 400, 150),
         ),
         'brisa': SupplierProfile(
             name='brisa',
             display_name='Brisa Service Areas',
             nif='514166096',
-            keywords=['brisa', 'areas.*servico'],
+            keywords=('brisa', 'areas.*servico'),
             header_region=(0, 0, 400, 150),
         ),
         'ikea': SupplierProfile(
             name='ikea',
             display_name='IKEA Portugal',
             nif='505416654',
-            keywords=['ikea', 'moveis.*decoracao'],
+            keywords=('ikea', 'moveis.*decoracao'),
             header_region=(0, 0, 400, 150),
         ),
         'leroy': SupplierProfile(
             name='leroy',
             display_name='Leroy Merlin',
             nif='506848556',
-            keywords=['leroy.*merlin', 'bricolage'],
+            keywords=('leroy.*merlin', 'bricolage'),
             header_region=(0, 0, 400, 150),
         ),
         'staples': SupplierProfile(
             name='staples',
             display_name='Staples Portugal',
             nif='503789372',
-            keywords=['staples', 'equipamento.*escritorio'],
+            keywords=('staples', 'equipamento.*escritorio'),
             header_region=(0, 0, 400, 150),
         ),
         'note': SupplierProfile(
             name='note',
             display_name='Note Papelaria',
             nif='517309505',
-            keywords=['note', 'mundo.*note', 'livraria.*papelaria'],
+            keywords=('note', 'mundo.*note', 'livraria.*papelaria'),
             header_region=(0, 0, 400, 150),
         ),
         'partyland': SupplierProfile(
             name='partyland',
             display_name='Partyland',
             nif='509199429',
-            keywords=['partyland', 'solucoes.*alegres'],
+            keywords=('partyland', 'solucoes.*alegres'),
             header_region=(0, 0, 400, 150),
         ),
         'alparques': SupplierProfile(
             name='alparques',
             display_name='Alparques Estacionamento',
             nif='514916494',
-            keywords=['alparques', 'parque.*estac'],
+            keywords=('alparques', 'parque.*estac'),
             header_region=(0, 0, 400, 150),
         ),
         'pizzahut': SupplierProfile(
             name='pizzahut',
             display_name='Pizza Hut',
             nif='502604735',
-            keywords=['pizza.*hut', 'iberusa'],
+            keywords=('pizza.*hut', 'iberusa'),
             header_region=(0, 0, 400, 150),
         ),
         'mcdonalds': SupplierProfile(
             name='mcdonalds',
             display_name='McDonald\'s',
             nif='504416014',
-            keywords=['mcdonald', 'magic.*empreend'],
+            keywords=('mcdonald', 'magic.*empreend'),
             header_region=(0, 0, 400, 150),
         ),
         'dominos': SupplierProfile(
             name='dominos',
             display_name='Domino\'s Pizza',
             nif='513146051',
-            keywords=['domino', 'daufood'],
+            keywords=('domino', 'daufood'),
             header_region=(0, 0, 400, 150),
         ),
         'apaisagem': SupplierProfile(
             name='apaisagem',
             display_name='Restaurante A Paisagem',
             nif='510577199',
-            keywords=['paisagem', 'wine.*glass', 'churrasqueira'],
+            keywords=('paisagem', 'wine.*glass', 'churrasqueira'),
             header_region=(0, 0, 400, 150),
         ),
         'a4tabacaria': SupplierProfile(
             name='a4tabacaria',
             display_name='A4 Tabacarias',
             nif='502749423',
-            keywords=['a4.*tabacaria', 'tabacarias.*lda'],
+            keywords=('a4.*tabacaria', 'tabacarias.*lda'),
             header_region=(0, 0, 400, 150),
         ),
         'anticapizzeria': SupplierProfile(
             name='anticapizzeria',
             display_name='Antica Pizzeria',
             nif='517973634',
-            keywords=['antica.*pizzeria', 'centralholding'],
+            keywords=('antica.*pizzeria', 'centralholding'),
             header_region=(0, 0, 400, 150),
         ),
         'italianrepublic': SupplierProfile(
             name='italianrepublic',
             display_name='Italian Republic Restaurant',
             nif='503254435',
-            keywords=['italian.*republic', 'estrela.*guia'],
+            keywords=('italian.*republic', 'estrela.*guia'),
             header_region=(0, 0, 400, 150),
         ),
         'reichurrasco': SupplierProfile(
             name='reichurrasco',
             display_name='Rei do Churrasco',
             nif='515553565',
-            keywords=['rei.*churrasco', 'titulo.*amistoso'],
+            keywords=('rei.*churrasco', 'titulo.*amistoso'),
             header_region=(0, 0, 400, 150),
         ),
         'solarfarelo': SupplierProfile(
             name='solarfarelo',
             display_name='Solar do Farelo',
             nif='504055224',
-            keywords=['solar.*farelo', 'dois.*dias.*hotelaria'],
+            keywords=('solar.*farelo', 'dois.*dias.*hotelaria'),
             header_region=(0, 0, 400, 150),
         ),
         'botanico': SupplierProfile(
             name='botanico',
             display_name='Botanico Restaurant',
             nif='516823961',
-            keywords=['botanico', 'quinta.*lago'],
+            keywords=('botanico', 'quinta.*lago'),
             header_region=(0, 0, 400, 150),
         ),
         'adegamonte': SupplierProfile(
             name='adegamonte',
             display_name='Adega do Monte Velho',
             nif='',  # No reliable NIF - use keyword match only
-            keywords=['adega.*monte', 'natureza.*prato'],
+            keywords=('adega.*monte', 'natureza.*prato'),
             header_region=(0, 0, 400, 150),
         ),
         'afamilia': SupplierProfile(
             name='afamilia',
             display_name='A Família Pizzaria',
             nif='508179047',
-            keywords=['familia', 'pizzaria.*artesanal.*brasileira'],
+            keywords=('familia', 'pizzaria.*artesanal.*brasileira'),
             header_region=(0, 0, 400, 150),
         ),
         'artisan': SupplierProfile(
             name='artisan',
             display_name='Artisan Restaurant',
             nif='515652946',
-            keywords=['artisan', 'luxury.*ingredient', 'old.*village'],
+            keywords=('artisan', 'luxury.*ingredient', 'old.*village'),
             header_region=(0, 0, 400, 150),
         ),
         'bagga': SupplierProfile(
             name='bagga',
             display_name='Bagga',
             nif='508879990',
-            keywords=['bagga', 'pronto.*gostar', 'bb.*food'],
+            keywords=('bagga', 'pronto.*gostar', 'bb.*food'),
             header_region=(0, 0, 400, 150),
         ),
         'maxidrive': SupplierProfile(
             name='maxidrive',
             display_name='Maxidrive Pizzaria',
             nif='515865672',
-            keywords=['maxidrive', 'galaxialaranjada'],
+            keywords=('maxidrive', 'galaxialaranjada'),
             header_region=(0, 0, 400, 150),
         ),
         'padoca': SupplierProfile(
             name='padoca',
             display_name='Padoca',
             nif='000000000',  # Needs keyword match
-            keywords=['padoca', 'costa.*leitas', 'las.*arcos'],
+            keywords=('padoca', 'costa.*leitas', 'las.*arcos'),
             header_region=(0, 0, 400, 150),
         ),
         'gildadasilva': SupplierProfile(
             name='gildadasilva',
             display_name='Gilda da Silva',
             nif='219329976',
-            keywords=['gilda.*silva', 'multiservicos.*solbelo'],
+            keywords=('gilda.*silva', 'multiservicos.*solbelo'),
             header_region=(0, 0, 400, 150),
         ),
         'robalo': SupplierProfile(
             name='robalo',
             display_name='Robalo S.A.',
             nif='500654573',
-            keywords=['robalo', 'utilidades.*dom.sticas', 'hoteleiras', 'robalo-sa\\.com'],
+            keywords=('robalo', 'utilidades.*dom.sticas', 'hoteleiras', 'robalo-sa\\.com'),
             header_region=(0, 0, 400, 150),
         ),
         'seminoshopping': SupplierProfile(
             name='seminoshopping',
             display_name='Semino Shopping',
             nif='247388858',
-            keywords=['semino.*shopping', 'chen.*shuang'],
+            keywords=('semino.*shopping', 'chen.*shuang'),
             header_region=(0, 0, 400, 150),
         ),
         'orientalshopping': SupplierProfile(
             name='orientalshopping',
             display_name='Oriental Shopping',
             nif='514703873',
-            keywords=['oriental.*shopping', 'orientalefeito'],
+            keywords=('oriental.*shopping', 'orientalefeito'),
             header_region=(0, 0, 400, 150),
         ),
         'shoppingloule': SupplierProfile(
             name='shoppingloule',
             display_name='Shopping Loulé',
             nif='509713955',
-            keywords=['shopping.*loule', 'leia.*creia'],
+            keywords=('shopping.*loule', 'leia.*creia'),
             header_region=(0, 0, 400, 150),
         ),
         # BP has multiple franchises with different NIFs - use keyword matching
@@ -509,38 +619,183 @@ class InvoiceClassifier:
             name='bp',
             display_name='BP Gas Station',
             nif='507161058',  # One of several BP NIFs
-            keywords=['\\bbp\\b', 'bp.*quarteira', 'bp.*vilamoura'],
+            keywords=('\\bbp\\b', 'bp.*quarteira', 'bp.*vilamoura'),
             header_region=(0, 0, 400, 150),
         ),
         'kiabi': SupplierProfile(
             name='kiabi',
             display_name='Kiabi',
             nif='000000000',  # Needs keyword match
-            keywords=['kiabi', 'fidelidade'],
+            keywords=('kiabi', 'fidelidade'),
             header_region=(0, 0, 400, 150),
         ),
         'brisatoll': SupplierProfile(
             name='brisatoll',
             display_name='Brisa Tolls (BCR)',
             nif='502790624',
-            keywords=['brisa.*concessao', 'bcr', 'portagem'],
+            keywords=('brisa.*concessao', 'bcr', 'portagem'),
             header_region=(0, 0, 400, 150),
         ),
     }
 
-    def __init__(self, templates_dir: Optional[Path] = None):
+    # Special handling for suppliers with same NIF but different document types
+    # Check for specific document type keywords first
+    NIF_SPECIAL_CASES = {
+        '500099871': [  # Teófilo NIF
+            ('teofilo_gd', [re.compile(kw) for kw in ('guia.*devolu', 'produto.*reclamado', 'produto.*devolvido')]),
+            ('teofilo_nc', [re.compile(kw) for kw in ('nota.*cr[ée]dito', 'c\\s*caau')]),
+            ('teofilo', []),  # Default fallback for this NIF
+        ],
+    }
+    NIF_SPECIAL_NAMES = frozenset({'teofilo_gd', 'teofilo_nc'})
+
+    # Resolution the first page is rendered at for classification and OCR
+    RENDER_DPI = 200
+
+    # Downscale factor for the header crop before OCR
+    HEADER_OCR_SCALE = 0.6
+
+    # Pixels around header_region searched for a template match
+    TEMPLATE_SEARCH_MARGIN = 50
+
+    # Classification results kept for re-classifying unchanged files
+    RESULT_CACHE_SIZE = 1024
+
+    # On-disk OCR cache: format version (bump when rendering or OCR output
+    # changes in a way the settings key does not capture) and entry lifetime
+    OCR_CACHE_VERSION = 1
+    OCR_CACHE_MAX_AGE_DAYS = 90
+
+    # Coarse-to-fine template matching: pyramid depth, smallest template side
+    # kept at the coarse level, candidates refined, refine window (+/- px)
+    TEMPLATE_PYRAMID_LEVELS = 3
+    TEMPLATE_PYRAMID_MIN_SIZE = 16
+    TEMPLATE_PYRAMID_CANDIDATES = 3
+    TEMPLATE_REFINE_RADIUS = 4
+
+    def __init__(self, templates_dir: Optional[Path] = None, cache_dir: Optional[Path] = None):
         """
         Initialize classifier.
 
         Args:
             templates_dir: Directory containing reference template images for each supplier
+            cache_dir: Directory for the on-disk OCR text cache (disabled if None)
         """
         self.templates_dir = templates_dir
+        self.cache_dir = cache_dir
+        if cache_dir:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+        # Hash of the OCR settings, keying the cache hashes; built on first lookup
+        self._ocr_settings_key: Optional[bytes] = None
         self.templates: dict[str, np.ndarray] = {}
+        self._template_pyramids: dict[str, list[np.ndarray]] = {}
+
+        # Compile supplier keyword patterns once instead of on every invoice.
+        # Keywords are lowercase and text is lowercased, so no IGNORECASE.
+        # Plain-text keywords (no regex syntax) get no pattern: a substring
+        # check is much cheaper than a regex search
+        self._compiled_keywords: dict[str, list[tuple[str, Optional[re.Pattern]]]] = {
+            name: [
+                (keyword, None if _REGEX_METACHARS.isdisjoint(keyword) else re.compile(keyword))
+                for keyword in profile.keywords
+            ]
+            for name, profile in self.SUPPLIERS.items()
+        }
+        self._keyword_db = self._build_keyword_db() if hyperscan else None
+        self._keyword_local = threading.local()
+
+        # NIF -> supplier lookup, in SUPPLIERS order (first supplier wins a shared NIF)
+        self._nif_to_supplier: dict[str, str] = {}
+        for name, profile in self.SUPPLIERS.items():
+            # Special case suppliers are resolved from their parent NIF
+            if name in self.NIF_SPECIAL_NAMES:
+                continue
+            # Skip suppliers without a valid NIF (need keyword matching instead)
+            if not profile.nif or len(profile.nif) < 9:
+                continue
+            self._nif_to_supplier.setdefault(profile.nif, name)
+
+        # Results for unchanged files: (path, mtime_ns, size) -> ClassificationResult
+        self._classify_cached = lru_cache(maxsize=self.RESULT_CACHE_SIZE)(self._classify_pdf)
+
+        # One tesserocr API per thread (PyTessBaseAPI is not thread-safe)
+        self._tesseract = threading.local()
 
         if templates_dir and templates_dir.exists():
             self._load_templates()
 
+    def _build_keyword_db(self):
+        """
+        Compile every supplier keyword into one Hyperscan database.
+
+        Returns:
+            Hyperscan database, or None if the keywords could not be compiled
+        """
+        # Pattern id -> (supplier, keyword), in SUPPLIERS order
+        self._keyword_ids = [
+            (name, keyword)
+            for name, profile in self.SUPPLIERS.items()
+            for keyword in profile.keywords
+        ]
+        base_flags = hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_UTF8
+        # Unicode properties (accented letters, \s) for every pattern except
+        # those using \b, which Hyperscan only supports in ASCII mode
+        flags = [
+            base_flags if '\\b' in keyword else base_flags | hyperscan.HS_FLAG_UCP
+            for _, keyword in self._keyword_ids
+        ]
+        db = hyperscan.Database()
+        try:
+            db.compile(
+                expressions=[keyword.encode('utf-8') for _, keyword in self._keyword_ids],
+                ids=list(range(len(self._keyword_ids))),
+                elements=len(self._keyword_ids),
+                flags=flags,
+            )
+        except hyperscan.error as e:
+            logger.warning(f"Hyperscan keyword compilation failed, using re: {e}")
+            return None
+        return db
+
+    def _match_keywords(self, text: str) -> dict[str, list[str]]:
+        """
+        Find which keywords of each supplier occur in text.
+
+        Args:
+            text: OCR extracted text
+
+        Returns:
+            Dict mapping supplier name to its matched keywords (SUPPLIERS order)
+        """
+        if self._keyword_db is None:
+            matched = {}
+            for name, keywords in self._compiled_keywords.items():
+                matches = [
+                    keyword for keyword, pattern in keywords
+                    if (keyword in text if pattern is None else pattern.search(text))
+                ]
+                if matches:
+                    matched[name] = matches
+            return matched
+
+        # Scratch space is per thread (classify_batch scans concurrently)
+        scratch = getattr(self._keyword_local, 'scratch', None)
+        if scratch is None:
+            scratch = self._keyword_local.scratch = hyperscan.Scratch(self._keyword_db)
+
+        hit_ids = set()
+
+        def on_match(pattern_id, start, end, flags, context):
+            hit_ids.add(pattern_id)
+
+        self._keyword_db.scan(text.encode('utf-8'), match_event_handler=on_match, scratch=scratch)
+
+        matched = {}
+        for pattern_id in sorted(hit_ids):
+            name, keyword = self._keyword_ids[pattern_id]
+            matched.setdefault(name, []).append(keyword)
+        return matched
+
     def _load_templates(self):
         """Load reference template images for each supplier."""
         for supplier_name in self.SUPPLIERS:
@@ -549,27 +804,182 @@ class InvoiceClassifier:
                 template = cv2.imread(str(template_path), cv2.IMREAD_GRAYSCALE)
                 if template is not None:
                     self.templates[supplier_name] = template
+                    self._template_pyramids[supplier_name] = self._build_pyramid(template)
                     logger.info(f"Loaded template for {supplier_name}")
 
-    def pdf_to_image(self, pdf_path: Path, dpi: int = 200) -> np.ndarray:
+    def _build_pyramid(self, template: np.ndarray) -> list[np.ndarray]:
+        """
+        Build a coarse-to-fine pyramid for template matching.
+
+        Args:
+            template: Grayscale template image
+
+        Returns:
+            Template at full, 1/2 and 1/4 resolution (fewer levels for small templates)
+        """
+        pyramid = [template]
+        for _ in range(self.TEMPLATE_PYRAMID_LEVELS - 1):
+            if min(pyramid[-1].shape) < 2 * self.TEMPLATE_PYRAMID_MIN_SIZE:
+                break
+            pyramid.append(cv2.pyrDown(pyramid[-1]))
+        return pyramid
+
+    def _match_template(self, search_area: np.ndarray, pyramid: list[np.ndarray]) -> tuple[float, tuple[int, int]]:
+        """
+        Find a template in a search area, coarse-to-fine.
+
+        Correlates at the smallest pyramid level, then refines the best
+        candidates in a small window at each finer level.
+
+        Args:
+            search_area: Grayscale region of the page to search
+            pyramid: Template pyramid from _build_pyramid
+
+        Returns:
+            Tuple of (normalized correlation, (x, y) of the match in search_area)
+        """
+        area_pyramid = [search_area]
+        for _ in range(len(pyramid) - 1):
+            area_pyramid.append(cv2.pyrDown(area_pyramid[-1]))
+
+        coarse = cv2.matchTemplate(area_pyramid[-1], pyramid[-1], cv2.TM_CCOEFF_NORMED)
+        if len(pyramid) == 1:
+            _, score, _, location = cv2.minMaxLoc(coarse)
+            return score, location
+
+        # Best few coarse candidates, so a near-tie at low resolution is not lost
+        count = min(self.TEMPLATE_PYRAMID_CANDIDATES, coarse.size)
+        flat = np.argpartition(coarse.ravel(), -count)[-count:]
+        candidates = [(int(x), int(y)) for y, x in zip(*np.unravel_index(flat, coarse.shape))]
+
+        for level in range(len(pyramid) - 2, -1, -1):
+            refined = [
+                self._refine_match(area_pyramid[level], pyramid[level], 2 * x, 2 * y)
+                for x, y in candidates
+            ]
+            # Only the best candidate goes on to the finer (more expensive) levels
+            best = max(refined)
+            candidates = [best[1]]
+
+        return best
+
+    def _refine_match(self, area: np.ndarray, template: np.ndarray, x: int, y: int) -> tuple[float, tuple[int, int]]:
+        """
+        Re-run template matching in a small window around a position.
+
+        Args:
+            area: Grayscale search area at this pyramid level
+            template: Template at this pyramid level
+            x, y: Estimated match position at this level
+
+        Returns:
+            Tuple of (normalized correlation, (x, y) of the best match in area)
+        """
+        th, tw = template.shape
+        radius = self.TEMPLATE_REFINE_RADIUS
+        max_x, max_y = area.shape[1] - tw, area.shape[0] - th
+        x0, y0 = max(0, min(x - radius, max_x)), max(0, min(y - radius, max_y))
+        x1, y1 = min(x + radius, max_x), min(y + radius, max_y)
+
+        window = area[y0:y1+th, x0:x1+tw]
+        _, score, _, (dx, dy) = cv2.minMaxLoc(cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED))
+        return score, (x0 + dx, y0 + dy)
+
+    def pdf_to_image(self, pdf_path: Path, dpi: int = 200, grayscale: bool = True) -> np.ndarray:
         """
         Convert first page of PDF to image.
 
         Args:
             pdf_path: Path to PDF file
             dpi: Resolution for conversion
+            grayscale: Have poppler render in grayscale (all OCR and template
+                matching work on gray images)
 
         Returns:
-            Image as numpy array (BGR format for OpenCV)
+            Image as numpy array (grayscale, or BGR format for OpenCV)
         """
-        images = pdf2image.convert_from_path(pdf_path, dpi=dpi, first_page=1, last_page=1)
+        if pymupdf is not None:
+            return self._render_pymupdf(pdf_path, dpi, grayscale)
+
+        images = pdf2image.convert_from_path(
+            pdf_path, dpi=dpi, first_page=1, last_page=1, grayscale=grayscale
+        )
         if not images:
             raise ValueError(f"Could not convert PDF: {pdf_path}")
 
         # Convert PIL Image to OpenCV format
         pil_image = images[0]
-        cv_image = cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
-        return cv_image
+        if grayscale:
+            return np.asarray(pil_image)
+        return cv2.cvtColor(np.asarray(pil_image), cv2.COLOR_RGB2BGR)
+
+    def _render_pymupdf(self, pdf_path: Path, dpi: int, grayscale: bool) -> np.ndarray:
+        """
+        Render first page of PDF straight into a numpy array with PyMuPDF.
+
+        Args:
+            pdf_path: Path to PDF file
+            dpi: Resolution for conversion
+            grayscale: Render a single gray channel instead of BGR
+
+        Returns:
+            Image as numpy array (grayscale, or BGR format for OpenCV)
+        """
+        with pymupdf.open(pdf_path) as doc:
+            if doc.page_count == 0:
+                raise ValueError(f"Could not convert PDF: {pdf_path}")
+            colorspace = pymupdf.csGRAY if grayscale else pymupdf.csRGB
+            pix = doc[0].get_pixmap(dpi=dpi, colorspace=colorspace, alpha=False)
+
+        image = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+        if grayscale:
+            return image[:, :, 0]
+        return cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+
+    def _tesseract_api(self):
+        """
+        Get this thread's tesserocr API, creating it on first use.
+
+        Returns:
+            PyTessBaseAPI, or None if tesserocr could not be initialised
+        """
+        api = getattr(self._tesseract, 'api', None)
+        if api is None:
+            try:
+                # Use Portuguese language for better accuracy
+                api = tesserocr.PyTessBaseAPI(lang='por', oem=_TESSERACT_OEM, variables=_TESSERACT_VARIABLES)
+            except RuntimeError:
+                try:
+                    # Fallback to default if Portuguese not available
+                    api = tesserocr.PyTessBaseAPI(oem=_TESSERACT_OEM, variables=_TESSERACT_VARIABLES)
+                except RuntimeError as e:
+                    logger.warning(f"tesserocr unavailable, using pytesseract: {e}")
+                    api = False
+            self._tesseract.api = api
+        return api or None
+
+    def _run_tesseract(self, gray: np.ndarray, psm: int) -> str:
+        """
+        Run Tesseract on a grayscale image.
+
+        Uses the in-process tesserocr API when installed, otherwise
+        spawns the tesseract binary through pytesseract.
+
+        Args:
+            gray: Grayscale image as numpy array
+            psm: Tesseract page segmentation mode
+
+        Returns:
+            Extracted text
+        """
+        api = self._tesseract_api() if tesserocr else None
+        if api is not None:
+            api.SetPageSegMode(psm)
+            api.SetImage(Image.fromarray(gray))
+            return api.GetUTF8Text()
+
+        config = f'{_TESSERACT_CONFIG} --psm {psm}'
+        return pytesseract.image_to_string(gray, lang=_pytesseract_lang(), config=config)
 
     def extract_text_ocr(self, image: np.ndarray) -> str:
         """
@@ -587,18 +997,7 @@ class InvoiceClassifier:
         else:
             gray = image
 
-        # Apply some preprocessing for better OCR
-        # Slight blur to reduce noise
-        gray = cv2.GaussianBlur(gray, (1, 1), 0)
-
-        # Use Portuguese language for better accuracy
-        try:
-            text = pytesseract.image_to_string(gray, lang='por')
-        except pytesseract.TesseractError:
-            # Fallback to default if Portuguese not available
-            text = pytesseract.image_to_string(gray)
-
-        return text.lower()
+        return self._run_tesseract(gray, psm=3).lower()
 
     def extract_header_text(self, image: np.ndarray) -> str:
         """
@@ -624,13 +1023,12 @@ class InvoiceClassifier:
         else:
             gray = header
 
-        # Use Portuguese language
-        try:
-            text = pytesseract.image_to_string(gray, lang='por', config='--psm 6')
-        except pytesseract.TesseractError:
-            text = pytesseract.image_to_string(gray, config='--psm 6')
+        # Header text is large enough to OCR at ~120 DPI (page is rendered at 200)
+        gray = cv2.resize(gray, None, fx=self.HEADER_OCR_SCALE, fy=self.HEADER_OCR_SCALE,
+                          interpolation=cv2.INTER_AREA)
 
-        return text.lower()
+        # Single uniform block of text
+        return self._run_tesseract(gray, psm=6).lower()
 
     def classify_by_nif(self, text: str) -> Optional[ClassificationResult]:
         """
@@ -642,62 +1040,43 @@ class InvoiceClassifier:
         Returns:
             Classification result if NIF found, None otherwise
         """
-        # Special handling for suppliers with same NIF but different document types
-        # Check for specific document type keywords first
-        SPECIAL_CASES = {
-            '500099871': [  # Teófilo NIF
-                ('teofilo_gd', ['guia.*devolu', 'produto.*reclamado', 'produto.*devolvido']),
-                ('teofilo_nc', ['nota.*cr[ée]dito', 'c\\s*caau']),
-                ('teofilo', []),  # Default fallback for this NIF
-            ],
-        }
-
-        for name, profile in self.SUPPLIERS.items():
-            # Skip special case suppliers - they'll be handled separately
-            if name in ['teofilo_gd', 'teofilo_nc']:
-                continue
+        text = text.lower()
 
-            # Skip suppliers without a valid NIF (need keyword matching instead)
-            if not profile.nif or len(profile.nif) < 9:
-                continue
+        # Every 9-digit NIF candidate, plain or spaced (PT prefixes contain the plain form)
+        found = {match.group(1).replace(' ', '') for match in _NIF_RE.finditer(text)}
+        matched_nifs = found & self._nif_to_supplier.keys()
+        if not matched_nifs:
+            return None
 
-            # Look for NIF with various formats: 501496912, 501 496 912, PT501496912
-            nif_patterns = [
-                profile.nif,  # Plain
-                ' '.join([profile.nif[i:i+3] for i in range(0, len(profile.nif), 3)]),  # Spaced
-                f"pt{profile.nif}",  # With PT prefix
-                f"pt {profile.nif}",
-            ]
+        # Several known NIFs on one document: the first supplier in SUPPLIERS wins
+        nif = next(nif for nif in self._nif_to_supplier if nif in matched_nifs)
+        name = self._nif_to_supplier[nif]
 
-            for pattern in nif_patterns:
-                if pattern.lower() in text:
-                    # Check if this NIF has special cases
-                    if profile.nif in SPECIAL_CASES:
-                        for special_name, keywords in SPECIAL_CASES[profile.nif]:
-                            if keywords:  # Has specific keywords to match
-                                if any(re.search(kw, text, re.IGNORECASE) for kw in keywords):
-                                    return ClassificationResult(
-                                        supplier=special_name,
-                                        confidence=0.95,
-                                        method='nif',
-                                        details={'matched_nif': profile.nif, 'special_type': special_name}
-                                    )
-                            else:  # Default case (no keywords = fallback)
-                                return ClassificationResult(
-                                    supplier=special_name,
-                                    confidence=0.95,
-                                    method='nif',
-                                    details={'matched_nif': profile.nif}
-                                )
-                    else:
+        # Check if this NIF has special cases
+        if nif in self.NIF_SPECIAL_CASES:
+            for special_name, keywords in self.NIF_SPECIAL_CASES[nif]:
+                if keywords:  # Has specific keywords to match
+                    if any(kw.search(text) for kw in keywords):
                         return ClassificationResult(
-                            supplier=name,
-                            confidence=0.95,  # NIF match is very reliable
+                            supplier=special_name,
+                            confidence=0.95,
                             method='nif',
-                            details={'matched_nif': profile.nif}
+                            details={'matched_nif': nif, 'special_type': special_name}
                         )
+                else:  # Default case (no keywords = fallback)
+                    return ClassificationResult(
+                        supplier=special_name,
+                        confidence=0.95,
+                        method='nif',
+                        details={'matched_nif': nif}
+                    )
 
-        return None
+        return ClassificationResult(
+            supplier=name,
+            confidence=0.95,  # NIF match is very reliable
+            method='nif',
+            details={'matched_nif': nif}
+        )
 
     def classify_by_keywords(self, text: str) -> Optional[ClassificationResult]:
         """
@@ -709,23 +1088,19 @@ class InvoiceClassifier:
         Returns:
             Classification result with confidence based on keyword matches
         """
+        text = text.lower()
+
         best_match = None
         best_score = 0
         best_matches = []
 
-        for name, profile in self.SUPPLIERS.items():
-            matches = []
-            for keyword in profile.keywords:
-                if re.search(keyword, text, re.IGNORECASE):
-                    matches.append(keyword)
-
+        for name, matches in self._match_keywords(text).items():
             # Score based on number of matches
-            if matches:
-                score = len(matches) / len(profile.keywords)
-                if score > best_score:
-                    best_score = score
-                    best_match = name
-                    best_matches = matches
+            score = len(matches) / len(self.SUPPLIERS[name].keywords)
+            if score > best_score:
+                best_score = score
+                best_match = name
+                best_matches = matches
 
         if best_match and best_score >= 0.3:  # At least 30% of keywords matched
             return ClassificationResult(
@@ -753,70 +1128,52 @@ class InvoiceClassifier:
         Returns:
             Date in YYYYMMDD format, or None if not found
         """
-        # Portuguese month abbreviations
-        pt_months = r'(jan|fev|mar|abr|mai|jun|jul|ago|set|out|nov|dez)'
+        text_lower = text.lower()
 
-        # Common date patterns (order matters - more specific patterns first)
+        # Skip date patterns whose separator (or month name) is not in the text at all
         date_patterns = [
-            # Portuguese month format: 30 - set - 2025 or 30 - set 2025 or 30-set-25
-            (rf'(\d{{1,2}})\s*[-–]\s*{pt_months}\s*[-–]?\s*(\d{{2,4}})', 'pt_month'),
-            # ISO format with dashes: 2025-02-10
-            (r'(\d{4})-(\d{1,2})-(\d{1,2})', 'ymd'),
-            # ISO format with slashes: 2025/02/10
-            (r'(\d{4})/(\d{1,2})/(\d{1,2})', 'ymd'),
-            # European/US format with slashes: 10/02/2025 or 2/16/2025
-            (r'(\d{1,2})/(\d{1,2})/(\d{4})', 'ambiguous'),
-            # European format with dashes: 10-02-2025
-            (r'(\d{1,2})-(\d{1,2})-(\d{4})', 'dmy'),
-            # European format with dots: 10.02.2025
-            (r'(\d{1,2})\.(\d{1,2})\.(\d{4})', 'dmy'),
-        ]
-
-        # Priority keywords for invoice ISSUE date (highest priority first)
-        priority_keywords = [
-            r'data\s*(?:de\s*)?emiss[ãa]o\s*[:\s]*',
-            r'data\s*(?:do\s*)?documento\s*[:\s]*',
-            r'data\s*(?:da\s*)?fact?ura\s*[:\s]*',
-            r'emitido\s*(?:em|a)?\s*[:\s]*',
-        ]
-
-        # Keywords to AVOID (these are due dates, not issue dates)
-        avoid_keywords = [
-            r'vencimento',
-            r'pagamento',
-            r'prazo',
+            (pattern, date_format) for pattern, date_format, literals in _DATE_PATTERNS
+            if any(literal in text_lower for literal in literals)
         ]
-
-        text_lower = text.lower()
+        if not date_patterns:
+            return None
 
         # First pass: Look for dates near priority keywords (issue date)
-        for keyword in priority_keywords:
-            keyword_match = re.search(keyword, text_lower)
+        for keyword in _PRIORITY_KEYWORDS:
+            keyword_match = keyword.search(text_lower)
             if keyword_match:
-                # Look for date pattern after the keyword
-                search_area = text_lower[keyword_match.end():keyword_match.end()+30]
+                # Look for date pattern in the 30 chars after the keyword
+                start = keyword_match.end()
 
                 for pattern, date_format in date_patterns:
-                    match = re.search(pattern, search_area)
+                    match = pattern.search(text_lower, start, start + 30)
                     if match:
-                        date = self._normalize_date(match, date_format)
+                        date = self._normalize_date(match.groups(), date_format)
                         if date:
                             return date
 
         # Second pass: Find all dates and pick the earliest one that's not a due date
         # This is a heuristic: invoice date is usually earlier than due date
         all_dates = []
+        # First match of the highest-priority pattern that matches at all,
+        # due date or not, for the last fallback
+        fallback = None
 
+        # One finditer per pattern: the patterns overlap (e.g. "1210-02-2025"
+        # holds both a ymd and a dmy date), so a single alternation would
+        # consume text another pattern needs
         for pattern, date_format in date_patterns:
-            for match in re.finditer(pattern, text_lower):
-                # Check if this date is near an "avoid" keyword
-                start_pos = max(0, match.start() - 50)
-                context = text_lower[start_pos:match.start()]
+            for match in pattern.finditer(text_lower):
+                groups = match.groups()
+                if fallback is None:
+                    fallback = (groups, date_format)
 
-                is_due_date = any(re.search(kw, context) for kw in avoid_keywords)
+                # Check if this date is near an "avoid" keyword (in the 50 chars before it)
+                date_start = match.start()
+                is_due_date = _AVOID_KEYWORDS_RE.search(text_lower, max(0, date_start - 50), date_start) is not None
 
                 if not is_due_date:
-                    date = self._normalize_date(match, date_format)
+                    date = self._normalize_date(groups, date_format)
                     if date:
                         all_dates.append(date)
 
@@ -824,38 +1181,28 @@ class InvoiceClassifier:
         if all_dates:
             return min(all_dates)
 
-        # Last fallback: any date at all
-        for pattern, date_format in date_patterns:
-            match = re.search(pattern, text_lower)
-            if match:
-                return self._normalize_date(match, date_format)
+        # Last fallback: any date at all (first match of the highest-priority pattern)
+        if fallback:
+            return self._normalize_date(*fallback)
 
         return None
 
-    def _normalize_date(self, match: re.Match, date_format: str) -> Optional[str]:
+    def _normalize_date(self, groups: tuple[str, ...], date_format: str) -> Optional[str]:
         """
         Convert matched date to YYYYMMDD format.
 
         Args:
-            match: Regex match object with date groups
+            groups: Date groups of the regex match
             date_format: 'ymd' for YYYY-MM-DD, 'dmy' for DD-MM-YYYY, 'ambiguous' for auto-detect,
                         'pt_month' for DD-MMM-YYYY with Portuguese month names
         """
-        # Portuguese month abbreviations mapping
-        pt_month_map = {
-            'jan': 1, 'fev': 2, 'mar': 3, 'abr': 4, 'mai': 5, 'jun': 6,
-            'jul': 7, 'ago': 8, 'set': 9, 'out': 10, 'nov': 11, 'dez': 12
-        }
-
-        groups = match.groups()
-
         try:
             if date_format == 'pt_month':
                 # Portuguese month format: DD - MMM - YYYY (e.g., 30 - set - 2025)
                 day = int(groups[0])
-                month_abbr = groups[1].lower()
+                month_abbr = groups[1]  # Matched in lowercased text
                 year = int(groups[2])
-                month = pt_month_map.get(month_abbr)
+                month = _PT_MONTH_NUMBERS.get(month_abbr)
                 if not month:
                     return None
                 # Handle 2-digit year
@@ -863,23 +1210,20 @@ class InvoiceClassifier:
                     year = 2000 + year
             elif date_format == 'ymd':
                 # ISO format: YYYY-MM-DD or YYYY/MM/DD
-                year, month, day = int(groups[0]), int(groups[1]), int(groups[2])
+                year, month, day = map(int, groups)
             elif date_format == 'dmy':
                 # European format: DD-MM-YYYY or DD/MM/YYYY
-                day, month, year = int(groups[0]), int(groups[1]), int(groups[2])
+                day, month, year = map(int, groups)
             elif date_format == 'ambiguous':
                 # Could be DD/MM/YYYY (European) or MM/DD/YYYY (US)
                 # Detect based on which value can be a valid month
-                first, second, year = int(groups[0]), int(groups[1]), int(groups[2])
+                first, second, year = map(int, groups)
 
-                if first > 12 and second <= 12:
-                    # First > 12, must be day (European: DD/MM/YYYY)
-                    day, month = first, second
-                elif second > 12 and first <= 12:
-                    # Second > 12, must be day (US: MM/DD/YYYY)
-                    month, day = first, second
+                # Only a second value > 12 (with a valid first month) means US
+                # MM/DD/YYYY; otherwise assume European DD/MM/YYYY for Portugal
+                if second > 12 and first <= 12:
+                    day, month = second, first
                 else:
-                    # Both could be month or day - assume European (DD/MM/YYYY) for Portugal
                     day, month = first, second
             else:
                 return None
@@ -889,8 +1233,7 @@ class InvoiceClassifier:
                 return None
 
             # Additional validation: check day is valid for month
-            days_in_month = [0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
-            if day > days_in_month[month]:
+            if day > _DAYS_IN_MONTH[month]:
                 return None
 
             return f"{year:04d}{month:02d}{day:02d}"
@@ -917,7 +1260,10 @@ class InvoiceClassifier:
             gray = image
 
         best_match = None
-        best_score = 0
+        best_ncc = 0
+        best_patch = None
+        best_template = None
+        margin = self.TEMPLATE_SEARCH_MARGIN
 
         for name, template in self.templates.items():
             profile = self.SUPPLIERS[name]
@@ -929,25 +1275,42 @@ class InvoiceClassifier:
             # Resize template to match header region if needed
             if template.shape != header.shape:
                 template_resized = cv2.resize(template, (header.shape[1], header.shape[0]))
+                pyramid = self._build_pyramid(template_resized)
             else:
                 template_resized = template
+                pyramid = self._template_pyramids.get(name) or self._build_pyramid(template)
 
-            # Calculate structural similarity
+            # Search a slightly larger area so small scan offsets still line up
+            top, left = max(0, y - margin), max(0, x - margin)
+            search_area = gray[top:y+h+margin, left:x+w+margin]
+
+            # Normalized cross-correlation (OpenCV, C/SIMD), coarse-to-fine
             try:
-                score, _ = ssim(header, template_resized, full=True)
-                if score > best_score:
-                    best_score = score
-                    best_match = name
-            except Exception as e:
+                ncc, (match_x, match_y) = self._match_template(search_area, pyramid)
+            except cv2.error as e:
                 logger.warning(f"Template matching failed for {name}: {e}")
                 continue
+            if ncc > best_ncc:
+                th, tw = template_resized.shape
+                best_ncc = ncc
+                best_match = name
+                best_patch = search_area[match_y:match_y+th, match_x:match_x+tw]
+                best_template = template_resized
+
+        # Verify the best candidate with structural similarity at its location
+        best_score = 0
+        if best_match:
+            try:
+                best_score, _ = ssim(best_patch, best_template, full=True)
+            except Exception as e:
+                logger.warning(f"Template matching failed for {best_match}: {e}")
 
         if best_match and best_score >= 0.4:  # Threshold for template match
             return ClassificationResult(
                 supplier=best_match,
                 confidence=best_score,
                 method='template',
-                details={'similarity_score': best_score}
+                details={'similarity_score': best_score, 'correlation': best_ncc}
             )
 
         return None
@@ -961,6 +1324,10 @@ class InvoiceClassifier:
         2. Template matching
         3. Keyword matching
 
+        Results are cached by path, modification time and size, so
+        classifying an unchanged file again skips rendering and OCR. Each
+        call gets its own copy, so callers may modify the result.
+
         Args:
             pdf_path: Path to invoice PDF
 
@@ -969,10 +1336,11 @@ class InvoiceClassifier:
         """
         logger.info(f"Classifying: {pdf_path.name}")
 
-        # Convert PDF to image
         try:
-            image = self.pdf_to_image(pdf_path)
-        except Exception as e:
+            stat = pdf_path.stat()
+            result = self._classify_cached(pdf_path, stat.st_mtime_ns, stat.st_size)
+        except (OSError, _PDFConversionError) as e:
+            # Not cached, so a retry converts the PDF again
             logger.error(f"Failed to convert PDF: {e}")
             return ClassificationResult(
                 supplier='unknown',
@@ -980,9 +1348,168 @@ class InvoiceClassifier:
                 method='error',
                 details={'error': str(e)}
             )
+        # Copy the cached result (details holds lists) so changes don't leak into later hits
+        return replace(result, details=copy.deepcopy(result.details))
+
+    def _render_page(self, pdf_path: Path) -> np.ndarray:
+        """
+        Convert first page of PDF to image for classification.
+
+        Args:
+            pdf_path: Path to invoice PDF
+
+        Returns:
+            Image as numpy array
+
+        Raises:
+            _PDFConversionError: If the PDF could not be converted
+        """
+        try:
+            return self.pdf_to_image(pdf_path, dpi=self.RENDER_DPI)
+        except Exception as e:
+            raise _PDFConversionError(str(e)) from e
+
+    def _ocr_settings(self) -> bytes:
+        """
+        Hash the OCR setup whose output the cache holds.
+
+        Returns:
+            Digest of the renderer, render DPI, OCR engine, language,
+            Tesseract config, header scale and cache version
+        """
+        if self._ocr_settings_key is None:
+            if tesserocr:
+                engine = f'tesserocr {tesserocr.tesseract_version()}'
+                lang = 'por' if 'por' in tesserocr.get_languages()[1] else None
+            else:
+                engine = 'pytesseract'
+                lang = _pytesseract_lang()
+            settings = json.dumps({
+                'version': self.OCR_CACHE_VERSION,
+                # Which rasterizer runs depends on what is installed, not on the code
+                'renderer': 'pymupdf' if pymupdf else 'pdf2image',
+                'dpi': self.RENDER_DPI,
+                'engine': engine,
+                'lang': lang,
+                'config': _TESSERACT_CONFIG,
+                'header_scale': self.HEADER_OCR_SCALE,
+            }, sort_keys=True)
+            self._ocr_settings_key = hashlib.blake2b(settings.encode()).digest()
+        return self._ocr_settings_key
+
+    def _ocr_cache_file(self, pdf_path: Path) -> Optional[Path]:
+        """
+        Locate the on-disk OCR cache entry for a PDF.
+
+        Entries are keyed by a hash of the file contents, so they survive
+        renames and moves (e.g. a dry run followed by the real run), and
+        of the OCR settings, so a changed setup never reads stale text.
+
+        Args:
+            pdf_path: Path to invoice PDF
+
+        Returns:
+            Path of the cache entry, or None if the cache is disabled
+        """
+        if not self.cache_dir:
+            return None
+        try:
+            digest = hashlib.blake2b(pdf_path.read_bytes(), digest_size=16, key=self._ocr_settings()).hexdigest()
+        except OSError:
+            return None
+        return self.cache_dir / f"{digest}.json"
+
+    def _load_ocr_cache(self, cache_file: Optional[Path]) -> dict:
+        """
+        Read an OCR cache entry.
+
+        Args:
+            cache_file: Entry path from _ocr_cache_file
+
+        Returns:
+            Dict with 'text' and optionally 'header_text' (empty on a miss)
+        """
+        if cache_file is None:
+            return {}
+        try:
+            return json.loads(cache_file.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable OCR cache entry {cache_file.name}: {e}")
+            return {}
+
+    def _save_ocr_cache(self, cache_file: Optional[Path], entry: dict):
+        """
+        Write an OCR cache entry (atomically, so parallel workers never see a partial file).
+
+        Args:
+            cache_file: Entry path from _ocr_cache_file
+            entry: Dict with 'text' and optionally 'header_text'
+        """
+        if cache_file is None:
+            return
+        temp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            temp_file.write_text(json.dumps(entry), encoding='utf-8')
+            os.replace(temp_file, cache_file)
+        except OSError as e:
+            logger.warning(f"Could not write OCR cache entry {cache_file.name}: {e}")
+
+    def prune_ocr_cache(self) -> int:
+        """
+        Delete OCR cache entries last written more than OCR_CACHE_MAX_AGE_DAYS ago.
+
+        Entries for deleted PDFs or an older OCR setup are never read again,
+        so without pruning the cache only grows.
+
+        Returns:
+            Number of entries deleted
+        """
+        if not self.cache_dir:
+            return 0
+        cutoff = datetime.now().timestamp() - self.OCR_CACHE_MAX_AGE_DAYS * 86400
+        removed = 0
+        for entry in self.cache_dir.glob('*.json'):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    entry.unlink()
+                    removed += 1
+            except OSError:
+                # Removed by a concurrent run, or not ours to delete
+                continue
+        if removed:
+            logger.info(f"Pruned {removed} OCR cache entries older than {self.OCR_CACHE_MAX_AGE_DAYS} days")
+        return removed
+
+    def _classify_pdf(self, pdf_path: Path, mtime_ns: int, size: int) -> ClassificationResult:
+        """
+        Classify an invoice PDF (uncached body of classify).
+
+        Args:
+            pdf_path: Path to invoice PDF
+            mtime_ns: File modification time, only part of the cache key
+            size: File size, only part of the cache key
+
+        Returns:
+            Classification result
+
+        Raises:
+            _PDFConversionError: If the PDF could not be converted to an image
+        """
+        # OCR text from an earlier run on the same file contents, if any
+        cache_file = self._ocr_cache_file(pdf_path)
+        ocr_cache = self._load_ocr_cache(cache_file)
+        cache_updated = False
+        image = None
 
         # Extract text with OCR
-        text = self.extract_text_ocr(image)
+        text = ocr_cache.get('text')
+        if text is None:
+            image = self._render_page(pdf_path)
+            text = self.extract_text_ocr(image)
+            ocr_cache['text'] = text
+            cache_updated = True
 
         # Try classification methods in order of reliability
 
@@ -992,9 +1519,18 @@ class InvoiceClassifier:
         # If no date found, try extracting from header region
         # (some invoices have dates in table headers that full-page OCR misses)
         if not invoice_date:
-            header_text = self.extract_header_text(image)
+            header_text = ocr_cache.get('header_text')
+            if header_text is None:
+                if image is None:
+                    image = self._render_page(pdf_path)
+                header_text = self.extract_header_text(image)
+                ocr_cache['header_text'] = header_text
+                cache_updated = True
             invoice_date = self.extract_invoice_date(header_text)
 
+        if cache_updated:
+            self._save_ocr_cache(cache_file, ocr_cache)
+
         # 1. NIF matching - most reliable
         result = self.classify_by_nif(text)
         if result and result.confidence >= 0.9:
@@ -1003,7 +1539,9 @@ class InvoiceClassifier:
             logger.info(f"Classified by NIF: {result.supplier} ({result.confidence:.2f}), date: {invoice_date}")
             return result
 
-        # 2. Template matching
+        # 2. Template matching (the page is only rendered if there are templates)
+        if self.templates and image is None:
+            image = self._render_page(pdf_path)
         template_result = self.classify_by_template(image)
 
         # 3. Keyword matching
@@ -1055,23 +1593,160 @@ class InvoiceClassifier:
             ocr_text=text
         )
 
-    def classify_batch(self, folder: Path) -> dict[str, ClassificationResult]:
+    def classify_batch(self, folder: Path, max_workers: Optional[int] = None) -> dict[str, ClassificationResult]:
         """
         Classify all PDFs in a folder.
 
+        Invoices are classified in parallel worker processes (see
+        process_pool), or in this process when there is only one.
+
         Args:
             folder: Path to folder containing PDFs
+            max_workers: Number of worker processes (default: CPU count)
 
         Returns:
             Dict mapping filename to classification result
         """
-        results = {}
-        pdf_files = list(folder.glob('*.pdf')) + list(folder.glob('*.PDF'))
+        return dict(self.classify_batch_iter(folder, max_workers))
+
+    def classify_batch_iter(
+        self, folder: Path, max_workers: Optional[int] = None
+    ) -> Iterator[tuple[str, ClassificationResult]]:
+        """
+        Classify all PDFs in a folder, yielding each result as it is ready.
+
+        Like classify_batch, but results are yielded in file order instead
+        of collected, so the caller need not hold every result (and its
+        OCR text) at once.
+
+        Args:
+            folder: Path to folder containing PDFs
+            max_workers: Number of worker processes (default: CPU count)
+
+        Yields:
+            (filename, classification result) tuples
+        """
+        pdf_files = _list_pdfs(folder)
+
+        with self.classification_jobs(pdf_files, max_workers) as jobs:
+            for pdf_path in pdf_files:
+                yield pdf_path.name, jobs.popleft()()
+
+    @contextmanager
+    def classification_jobs(
+        self, pdf_files: list[Path], max_workers: Optional[int] = None
+    ) -> Iterator[deque[Callable[[], ClassificationResult]]]:
+        """
+        Start classifying PDFs, in worker processes when there are several.
+
+        The pool gets no more workers than there are files. A single file
+        is classified in this process instead, without starting workers,
+        and goes through this classifier's result cache.
+
+        Args:
+            pdf_files: PDFs to classify
+            max_workers: Number of worker processes (default: CPU count)
+
+        Yields:
+            One callable per file, in order, returning its classification
+            result (pop them as they are handled, so results can be freed)
+        """
+        if len(pdf_files) <= 1:
+            yield deque(partial(self.classify, pdf_path) for pdf_path in pdf_files)
+            return
+
+        with self.process_pool(min(len(pdf_files), max_workers or os.cpu_count())) as executor:
+            yield deque(executor.submit(_classify_in_worker, pdf_path).result for pdf_path in pdf_files)
+
+    def process_pool(self, max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+        """
+        Start a process pool for classifying many invoices in parallel.
+
+        Each worker builds its own classifier with this one's templates and
+        cache directories; submit _classify_in_worker with a PDF path. Each
+        Tesseract call is limited to one OpenMP thread (OMP_THREAD_LIMIT=1,
+        unless already set), so N workers use roughly N cores.
+
+        Args:
+            max_workers: Number of worker processes (default: CPU count)
+
+        Returns:
+            ProcessPoolExecutor (use as a context manager)
+        """
+        # Inherited by the workers and their tesseract subprocesses
+        os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+        return ProcessPoolExecutor(
+            max_workers=max_workers or os.cpu_count(),
+            initializer=_init_worker,
+            initargs=(self.templates_dir, self.cache_dir),
+        )
+
+
+def _claim_name(taken: set[str], next_counter: dict[str, int], filename: str, stem: str) -> str:
+    """
+    Reserve a free file name in a folder.
+
+    Tries filename, then {stem}_1.pdf, {stem}_2.pdf, ... Names are never
+    released, so the probe resumes after the last counter claimed for the
+    stem instead of starting again from 1.
+
+    Args:
+        taken: Names in use in the destination folder (updated in place)
+        next_counter: Next counter to try per stem in that folder (updated in place)
+        filename: Preferred file name
+        stem: Base for numbered names when filename is taken
+
+    Returns:
+        The reserved file name
+    """
+    if filename in taken:
+        for counter in itertools.count(next_counter.get(stem, 1)):
+            filename = f"{stem}_{counter}.pdf"
+            if filename not in taken:
+                next_counter[stem] = counter + 1
+                break
+    taken.add(filename)
+    return filename
+
+
+def _list_pdfs(folder: Path) -> list[Path]:
+    """
+    List the PDF files directly inside a folder.
+
+    A single directory scan with a case-insensitive suffix check, so each
+    file is listed once even on case-insensitive filesystems. Hidden files
+    are skipped (unlike glob('*.pdf'), which matches them), so macOS
+    AppleDouble files such as ._invoice.pdf are not classified.
+
+    Args:
+        folder: Folder to scan
+
+    Returns:
+        Paths of the PDF files, sorted by name
+    """
+    with os.scandir(folder) as entries:
+        return sorted(
+            Path(entry.path) for entry in entries
+            if not entry.name.startswith('.')
+            and entry.name.lower().endswith('.pdf')
+            and entry.is_file()
+        )
+
+
+# Classifier of the current process-pool worker (set by _init_worker)
+_worker_classifier: Optional[InvoiceClassifier] = None
 
-        for pdf_path in pdf_files:
-            results[pdf_path.name] = self.classify(pdf_path)
 
-        return results
+def _init_worker(templates_dir: Optional[Path], cache_dir: Optional[Path]):
+    """Process-pool initializer: build this worker's classifier once."""
+    global _worker_classifier
+    _worker_classifier = InvoiceClassifier(templates_dir=templates_dir, cache_dir=cache_dir)
+
+
+def _classify_in_worker(pdf_path: Path) -> ClassificationResult:
+    """Classify one PDF in a process-pool worker."""
+    return _worker_classifier.classify(pdf_path)
 
 
 def upload_to_api(file_path: Path, supplier: str) -> dict:
@@ -1087,9 +1762,14 @@ def upload_to_api(file_path: Path, supplier: str) -> dict:
     Returns:
         Dict with upload result
     """
-    try:
-        from api_config import get_route
+    if get_route is None:
+        return {
+            'success': False,
+            'supplier': supplier,
+            'message': 'Import error: api_config is not available'
+        }
 
+    try:
         route = get_route(supplier)
         if not route:
             return {
@@ -1099,7 +1779,7 @@ def upload_to_api(file_path: Path, supplier: str) -> dict:
                 'message': f'No API route configured for supplier: {supplier}'
             }
 
-        if route.provider == 'parseur':
+        if route.provider is PROVIDER_PARSEUR:
             from parseur_client import upload_invoice
             result = upload_invoice(file_path, supplier)
             return {
@@ -1109,7 +1789,7 @@ def upload_to_api(file_path: Path, supplier: str) -> dict:
                 'mailbox_id': result.mailbox_id,
                 'message': result.message
             }
-        elif route.provider == 'docupipe':
+        elif route.provider is PROVIDER_DOCUPIPE:
             from docupipe_client import upload_receipt
             result = upload_receipt(file_path, supplier)
             return {
@@ -1124,7 +1804,7 @@ def upload_to_api(file_path: Path, supplier: str) -> dict:
             return {
                 'success': False,
                 'supplier': supplier,
-                'provider': route.provider,
+                'provider': str(route.provider),
                 'message': f"Provider '{route.provider}' not implemented"
             }
 
@@ -1142,15 +1822,15 @@ def upload_to_api(file_path: Path, supplier: str) -> dict:
         }
 
 
+@lru_cache(maxsize=None)
 def _has_integration(supplier: str) -> bool:
     """Check if a supplier has an API integration (mailbox_id or workflow_id)."""
-    try:
-        from api_config import get_route
-        route = get_route(supplier)
-        if route and route.enabled:
-            return bool(route.mailbox_id or route.workflow_id)
-    except ImportError:
-        pass
+    # Cached: the routing table is loaded once per process and never changes
+    if get_route is None:
+        return False
+    route = get_route(supplier)
+    if route and route.enabled:
+        return bool(route.mailbox_id or route.workflow_id)
     return False
 
 
@@ -1161,7 +1841,8 @@ def process_and_move(
     review_dir: Path,
     integrated_dir: Path,
     dry_run: bool = False,
-    upload: bool = False
+    upload: bool = False,
+    max_workers: Optional[int] = None
 ) -> dict:
     """
     Process all PDFs in source directory, rename and move them.
@@ -1178,6 +1859,7 @@ def process_and_move(
         integrated_dir: Directory for matched invoices with API workflow/mailbox
         dry_run: If True, only show what would happen without moving files
         upload: If True, upload classified invoices to OCR API
+        max_workers: Number of classification worker processes (default: CPU count)
 
     Returns:
         Dict with processing statistics
@@ -1200,106 +1882,108 @@ def process_and_move(
 
     current_year = datetime.now().year
 
-    pdf_files = list(source_dir.glob('*.pdf')) + list(source_dir.glob('*.PDF'))
+    pdf_files = _list_pdfs(source_dir)
 
-    for pdf_path in pdf_files:
-        stats['total'] += 1
+    # Names already used in each destination folder: listed once up front and
+    # updated as files are assigned, instead of a stat per candidate name
+    taken_names = {
+        folder: {path.name for path in folder.iterdir()}
+        for folder in (integrated_dir, matched_dir, review_dir)
+    }
+    next_counters = {folder: {} for folder in taken_names}
 
-        try:
-            # Classify the invoice
-            result = classifier.classify(pdf_path)
+    # Classify in worker processes; renaming, moving and uploading stay here,
+    # in file order, so there are no races on destination names
+    with classifier.classification_jobs(pdf_files, max_workers) as jobs:
+        for pdf_path in pdf_files:
+            job = jobs.popleft()
+            stats['total'] += 1
 
-            if result.supplier != 'unknown':
-                # Build new filename: YYYYMMDD_Supplier.pdf
-                if result.invoice_date:
-                    date_part = result.invoice_date
-                else:
-                    date_part = f"{current_year}XXXX"
+            try:
+                # Classify the invoice
+                result = job()
 
-                # Capitalize supplier name properly
-                supplier_name = result.supplier.capitalize()
+                if result.supplier != 'unknown':
+                    # Build new filename: YYYYMMDD_Supplier.pdf
+                    if result.invoice_date:
+                        date_part = result.invoice_date
+                    else:
+                        date_part = f"{current_year}XXXX"
 
-                # Choose destination: INTEGRATED (has workflow/mailbox) or MATCHED
-                has_api = _has_integration(result.supplier)
-                target_dir = integrated_dir if has_api else matched_dir
+                    # Capitalize supplier name properly
+                    supplier_name = result.supplier.capitalize()
 
-                # Handle duplicate filenames by adding a counter
-                new_filename = f"{date_part}_{supplier_name}.pdf"
-                dest_path = target_dir / new_filename
+                    # Choose destination: INTEGRATED (has workflow/mailbox) or MATCHED
+                    has_api = _has_integration(result.supplier)
+                    target_dir = integrated_dir if has_api else matched_dir
 
-                counter = 1
-                while dest_path.exists():
-                    new_filename = f"{date_part}_{supplier_name}_{counter}.pdf"
+                    # Handle duplicate filenames by adding a counter
+                    stem = f"{date_part}_{supplier_name}"
+                    new_filename = _claim_name(taken_names[target_dir], next_counters[target_dir], f"{stem}.pdf", stem)
                     dest_path = target_dir / new_filename
-                    counter += 1
 
-                if has_api:
-                    stats['integrated'] += 1
-                    action = 'INTEGRATED'
+                    if has_api:
+                        stats['integrated'] += 1
+                        action = 'INTEGRATED'
+                    else:
+                        stats['matched'] += 1
+                        action = 'MATCHED'
                 else:
-                    stats['matched'] += 1
-                    action = 'MATCHED'
-            else:
-                # Unknown - move to review with original name
-                new_filename = pdf_path.name
-                dest_path = review_dir / new_filename
-
-                # Handle duplicates
-                counter = 1
-                while dest_path.exists():
-                    stem = pdf_path.stem
-                    new_filename = f"{stem}_{counter}.pdf"
-                    dest_path = review_dir / new_filename
-                    counter += 1
-
-                stats['review'] += 1
-                action = 'REVIEW'
+                    # Unknown - move to review with original name
+                    new_filename = pdf_path.name
 
-            # Log the action
-            file_info = {
-                'original': pdf_path.name,
-                'new_name': new_filename,
-                'supplier': result.supplier,
-                'confidence': result.confidence,
-                'date': result.invoice_date,
-                'action': action,
-                'dest': str(dest_path)
-            }
-            stats['files'].append(file_info)
+                    # Handle duplicates
+                    new_filename = _claim_name(taken_names[review_dir], next_counters[review_dir], new_filename, pdf_path.stem)
+                    dest_path = review_dir / new_filename
 
-            if dry_run:
-                logger.info(f"[DRY RUN] {pdf_path.name} -> {action}/{new_filename}")
-                if upload and action == 'INTEGRATED':
-                    logger.info(f"[DRY RUN] Would upload to API for supplier: {result.supplier}")
-            else:
-                shutil.move(str(pdf_path), str(dest_path))
-                logger.info(f"{pdf_path.name} -> {action}/{new_filename}")
-
-                # Upload to OCR API if enabled and has integration
-                if upload and action == 'INTEGRATED':
-                    upload_result = upload_to_api(dest_path, result.supplier)
-                    file_info['upload'] = upload_result
-                    if upload_result['success']:
-                        stats['uploaded'] += 1
-                        provider = upload_result.get('provider', '?')
-                        if provider == 'parseur':
-                            logger.info(f"  -> Uploaded to Parseur mailbox {upload_result.get('mailbox_id', '?')}")
-                        elif provider == 'docupipe':
-                            logger.info(f"  -> Uploaded to Docupipe (doc_id: {upload_result.get('document_id', '?')})")
+                    stats['review'] += 1
+                    action = 'REVIEW'
+
+                # Log the action
+                file_info = {
+                    'original': pdf_path.name,
+                    'new_name': new_filename,
+                    'supplier': result.supplier,
+                    'confidence': result.confidence,
+                    'date': result.invoice_date,
+                    'action': action,
+                    'dest': str(dest_path)
+                }
+                stats['files'].append(file_info)
+
+                if dry_run:
+                    logger.info(f"[DRY RUN] {pdf_path.name} -> {action}/{new_filename}")
+                    if upload and action == 'INTEGRATED':
+                        logger.info(f"[DRY RUN] Would upload to API for supplier: {result.supplier}")
+                else:
+                    shutil.move(str(pdf_path), str(dest_path))
+                    logger.info(f"{pdf_path.name} -> {action}/{new_filename}")
+
+                    # Upload to OCR API if enabled and has integration
+                    if upload and action == 'INTEGRATED':
+                        upload_result = upload_to_api(dest_path, result.supplier)
+                        file_info['upload'] = upload_result
+                        if upload_result['success']:
+                            stats['uploaded'] += 1
+                            provider = upload_result.get('provider', '?')
+                            if provider == 'parseur':
+                                logger.info(f"  -> Uploaded to Parseur mailbox {upload_result.get('mailbox_id', '?')}")
+                            elif provider == 'docupipe':
+                                logger.info(f"  -> Uploaded to Docupipe (doc_id: {upload_result.get('document_id', '?')})")
+                            else:
+                                logger.info(f"  -> Uploaded to {provider}")
                         else:
-                            logger.info(f"  -> Uploaded to {provider}")
-                    else:
-                        stats['upload_failed'] += 1
-                        logger.warning(f"  -> Upload failed: {upload_result['message']}")
+                            stats['upload_failed'] += 1
+                            logger.warning(f"  -> Upload failed: {upload_result['message']}")
 
-        except Exception as e:
-            stats['errors'] += 1
-            logger.error(f"Error processing {pdf_path.name}: {e}")
-            stats['files'].append({
-                'original': pdf_path.name,
-                'error': str(e),
-                'action': 'ERROR'
-            })
+            except Exception as e:
+                stats['errors'] += 1
+                logger.error(f"Error processing {pdf_path.name}: {e}")
+                stats['files'].append({
+                    'original': pdf_path.name,
+                    'error': str(e),
+                    'action': 'ERROR'
+                })
 
     return stats
 
@@ -1334,8 +2018,7 @@ def generate_templates(invoices_dir: Path, output_dir: Path):
         logger.info(f"Generating template for {supplier_name} from {sample_path.name}")
 
         try:
-            image = classifier.pdf_to_image(sample_path)
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            gray = classifier.pdf_to_image(sample_path)
 
             # Extract header region
             profile = classifier.SUPPLIERS[supplier_name]
@@ -1349,7 +2032,7 @@ def generate_templates(invoices_dir: Path, output_dir: Path):
 
             # Also save full first page for reference
             full_path = output_dir / f"{supplier_name}_full.png"
-            cv2.imwrite(str(full_path), image)
+            cv2.imwrite(str(full_path), gray)
 
         except Exception as e:
             logger.error(f"Failed to generate template for {supplier_name}: {e}")
@@ -1361,6 +2044,7 @@ if __name__ == '__main__':
     base_dir = Path(__file__).parent
     invoices_dir = base_dir / 'invoices_example'
     templates_dir = base_dir / 'templates'
+    cache_dir = base_dir / '.cache'
     integrated_dir = base_dir / 'INTEGRATED'
     matched_dir = base_dir / 'MATCHED'
     review_dir = base_dir / 'REVIEW'
@@ -1459,7 +2143,8 @@ Default folder: invoices_example/
                     print("Upload will fail for suppliers using unconfigured APIs.")
                     print("Configure in config.json (see config.example.json)")
 
-            classifier = InvoiceClassifier(templates_dir=templates_dir)
+            classifier = InvoiceClassifier(templates_dir=templates_dir, cache_dir=cache_dir)
+            classifier.prune_ocr_cache()
 
             mode_str = ""
             if dry_run:
@@ -1508,7 +2193,8 @@ Default folder: invoices_example/
     else:
         # No command - just classify and show results
         # Default: Classify and show results without moving
-        classifier = InvoiceClassifier(templates_dir=templates_dir)
+        classifier = InvoiceClassifier(templates_dir=templates_dir, cache_dir=cache_dir)
+        classifier.prune_ocr_cache()
 
         print("\n" + "="*70)
         print("INVOICE CLASSIFICATION RESULTS")
@@ -151,6 +151,7 @@ rsync -a --delete \
     --exclude='teofilo_nc/' \
     --exclude='old/' \
     --exclude='templates/' \
+    --exclude='.cache/' \
     --exclude='.claude/' \
     --exclude='config.json' \
     --exclude='drivek.json' \
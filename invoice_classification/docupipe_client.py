@@ -5,20 +5,37 @@ Uploads receipt documents to Docupipe for OCR processing.
 API Documentation: https://docs.docupipe.ai/reference
 """
 
-import base64
+import copy
+import json
 import logging
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
-from dataclasses import dataclass
+from typing import BinaryIO, Iterable, Optional
+from dataclasses import dataclass, replace
 
 import requests
 
-from api_config import DOCUPIPE_API_KEY, DOCUPIPE_BASE_URL, get_route
+# Optional: pybase64 encodes with SIMD, several times faster than stdlib base64
+try:
+    from pybase64 import b64encode
+except ImportError:
+    from base64 import b64encode
+
+from api_config import DOCUPIPE_BASE_URL, PROVIDER_DOCUPIPE, get_docupipe_key, get_route, route_error
+from http_session import TRANSIENT_STATUSES, UPLOAD_CONCURRENCY, CircuitBreaker, InFlightUploads, shared_session
 
 logger = logging.getLogger(__name__)
 
+# Largest file sent to Docupipe; bigger files are rejected without reading them
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class UploadResult:
     """Result of uploading a document to Docupipe."""
     success: bool
@@ -30,18 +47,145 @@ class UploadResult:
     response_data: Optional[dict] = None
 
 
+class _Base64JSONBody:
+    """
+    JSON request body with a file embedded as a base64 string, encoded on the fly.
+
+    The body is prefix + base64(file) + suffix. Bytes are produced as the
+    HTTP layer reads them, so the whole file (and its base64 copy) is never
+    held in memory. The file is memory-mapped and encoded straight from the
+    page cache, without copying blocks into Python buffers. The length is
+    known up front (sent as Content-Length), and seek(0) rewinds the body
+    so the request can be retried. Use as a context manager to unmap the file.
+    """
+
+    # Bytes of file encoded per block (a multiple of 3, so blocks encode
+    # independently with no padding until the end of the file)
+    READ_SIZE = 3 * 64 * 1024
+
+    def __init__(self, prefix: bytes, file: BinaryIO, suffix: bytes):
+        """
+        Args:
+            prefix: JSON text before the base64 string
+            file: Open binary file to embed
+            suffix: JSON text after the base64 string
+        """
+        self._prefix = prefix
+        self._suffix = suffix
+        file_size = os.fstat(file.fileno()).st_size
+        # Empty files cannot be mapped
+        self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if file_size else None
+        self._data = memoryview(self._map) if self._map is not None else memoryview(b'')
+        self._encoded_end = len(prefix) + 4 * -(-file_size // 3)
+        self._length = self._encoded_end + len(suffix)
+        self._position = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Unmap the file."""
+        self._data.release()
+        if self._map is not None:
+            self._map.close()
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(self.READ_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    def tell(self) -> int:
+        """Current read position in the body."""
+        return self._position
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        """Move the read position (used by urllib3 to rewind on retry)."""
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self._length
+        self._position = min(max(offset, 0), self._length)
+        return self._position
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        """Read up to size bytes of the body (all remaining bytes if size < 0)."""
+        if size is None or size < 0:
+            size = self._length - self._position
+        parts = []
+        while size > 0 and self._position < self._length:
+            part = self._read_part(size)
+            parts.append(part)
+            self._position += len(part)
+            size -= len(part)
+        return b''.join(parts)
+
+    def _read_part(self, size: int) -> bytes:
+        """Read up to size bytes from the body segment at the current position."""
+        position = self._position
+        prefix_length = len(self._prefix)
+        if position < prefix_length:
+            return self._prefix[position:position + size]
+        if position >= self._encoded_end:
+            offset = position - self._encoded_end
+            return self._suffix[offset:offset + size]
+
+        # Encoded segment: start at the base64 group holding this position
+        group, skip = divmod(position - prefix_length, 4)
+        size = min(size, self._encoded_end - position)
+        start = group * 3
+        data = self._data[start:start + min(-(-(skip + size) // 4) * 3, self.READ_SIZE)]
+        return b64encode(data)[skip:skip + size]
+
+
 class DocupipeClient:
     """Client for interacting with Docupipe API."""
 
-    def __init__(self, api_key: Optional[str] = None):
+    # Shared by all clients in the process: trips while the Docupipe API is down
+    _breaker = CircuitBreaker()
+    # Shared by all clients in the process: files being uploaded right now
+    _inflight = InFlightUploads()
+
+    # Job statuses that never change again, cached until evicted
+    TERMINAL_JOB_STATUSES = frozenset({'completed', 'failed', 'error'})
+    # Seconds a non-terminal job status is reused before polling again
+    JOB_STATUS_TTL = 2.0
+    # Job statuses kept per client; the least recently used is evicted first
+    JOB_STATUS_CACHE_SIZE = 10000
+
+    def __init__(self, api_key: Optional[str] = None, session: Optional[requests.Session] = None):
         """
         Initialize Docupipe client.
 
         Args:
             api_key: Docupipe API key. If not provided, uses config file or env var.
+            session: HTTP session to send requests with. If not provided, uses the
+                process-wide session, so connections are reused across clients.
         """
-        self.api_key = api_key or DOCUPIPE_API_KEY
+        self.api_key = api_key or get_docupipe_key()
         self.base_url = DOCUPIPE_BASE_URL
+        # Keep-alive connections; retries transient failures with backoff
+        self.session = session or shared_session()
+        # Built once; requests merges them per call without modifying them
+        self._upload_headers = {
+            "accept": "application/json",
+            "content-type": "application/json",
+            "X-API-Key": self.api_key
+        }
+        self._status_headers = {
+            "accept": "application/json",
+            "X-API-Key": self.api_key
+        }
+        # Job ID -> (monotonic time fetched, status dict), least recently used first
+        self._status_cache: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._status_cache_lock = threading.Lock()
 
         if not self.api_key:
             logger.warning("Docupipe API key not configured. Set in config.json or DOCUPIPE_API_KEY env var.")
@@ -50,6 +194,26 @@ class DocupipeClient:
         """Check if API key is configured."""
         return bool(self.api_key)
 
+    def close(self):
+        """
+        Release the client.
+
+        The HTTP session is left open: it is either the process-wide one,
+        still in use by other clients and upload threads, or the caller's,
+        who closes it.
+        """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def _fail(filename: str, message: str, supplier: str = '') -> UploadResult:
+        """Build the result of a failed upload."""
+        return UploadResult(success=False, supplier=supplier, filename=filename, message=message)
+
     def upload_document(
         self,
         file_path: Path,
@@ -66,31 +230,31 @@ class DocupipeClient:
             UploadResult with success status and details
         """
         if not self.api_key:
-            return UploadResult(
-                success=False,
-                supplier='',
-                filename=file_path.name,
-                message="Docupipe API key not configured"
-            )
+            return self._fail(file_path.name, "Docupipe API key not configured")
 
-        url = f"{self.base_url}/document"
+        if not self._breaker.allow():
+            return self._fail(file_path.name, "Docupipe API unavailable (circuit open), upload skipped")
 
-        headers = {
-            "accept": "application/json",
-            "content-type": "application/json",
-            "X-API-Key": self.api_key
-        }
+        with self._inflight.claim(file_path) as claimed:
+            if not claimed:
+                return self._fail(file_path.name, "Upload of this file already in progress")
+            return self._upload_document(file_path, workflow_id)
+
+    def _upload_document(self, file_path: Path, workflow_id: Optional[str]) -> UploadResult:
+        """Send a document to Docupipe (see upload_document)."""
+        url = f"{self.base_url}/document"
 
         try:
-            # Read and base64 encode the file
-            with open(file_path, 'rb') as f:
-                file_contents = base64.b64encode(f.read()).decode('utf-8')
+            file_size = file_path.stat().st_size
+            if file_size > MAX_UPLOAD_BYTES:
+                return self._fail(file_path.name, f"File too large for Docupipe: {file_size} bytes (limit {MAX_UPLOAD_BYTES})")
 
-            # Build payload
+            # Build payload, with a placeholder where the base64 contents go
+            # (NUL cannot appear in a filename, so the placeholder is unique)
             payload = {
                 "document": {
                     "file": {
-                        "contents": file_contents,
+                        "contents": "\0",
                         "filename": file_path.name
                     }
                 }
@@ -100,16 +264,22 @@ class DocupipeClient:
             if workflow_id:
                 payload["workflowId"] = workflow_id
 
-            response = requests.post(
-                url,
-                json=payload,
-                headers=headers,
-                timeout=120  # Longer timeout for base64 uploads
-            )
+            prefix, suffix = json.dumps(payload).split('\\u0000', 1)
+
+            # Stream the file base64-encoded between the JSON prefix and suffix
+            with open(file_path, 'rb') as f, _Base64JSONBody(prefix.encode(), f, suffix.encode()) as body:
+                response = self.session.post(
+                    url,
+                    data=body,
+                    headers=self._upload_headers,
+                    timeout=120  # Longer timeout for base64 uploads
+                )
+
+            self._breaker.record(failed=response.status_code in TRANSIENT_STATUSES)
 
             if response.status_code in (200, 201, 202):
                 data = response.json() if response.text else {}
-                logger.info(f"Uploaded {file_path.name} to Docupipe (doc_id: {data.get('documentId')})")
+                logger.info("Uploaded %s to Docupipe (doc_id: %s)", file_path.name, data.get('documentId'))
                 return UploadResult(
                     success=True,
                     supplier='',
@@ -121,35 +291,17 @@ class DocupipeClient:
                 )
             else:
                 error_msg = f"HTTP {response.status_code}: {response.text}"
-                logger.error(f"Failed to upload {file_path.name}: {error_msg}")
-                return UploadResult(
-                    success=False,
-                    supplier='',
-                    filename=file_path.name,
-                    message=error_msg
-                )
+                logger.error("Failed to upload %s: %s", file_path.name, error_msg)
+                return self._fail(file_path.name, error_msg)
 
         except requests.exceptions.Timeout:
-            return UploadResult(
-                success=False,
-                supplier='',
-                filename=file_path.name,
-                message="Request timed out"
-            )
+            self._breaker.record(failed=True)
+            return self._fail(file_path.name, "Request timed out")
         except requests.exceptions.RequestException as e:
-            return UploadResult(
-                success=False,
-                supplier='',
-                filename=file_path.name,
-                message=f"Request failed: {str(e)}"
-            )
+            self._breaker.record(failed=True)
+            return self._fail(file_path.name, f"Request failed: {str(e)}")
         except Exception as e:
-            return UploadResult(
-                success=False,
-                supplier='',
-                filename=file_path.name,
-                message=f"Unexpected error: {str(e)}"
-            )
+            return self._fail(file_path.name, f"Unexpected error: {str(e)}")
 
     def upload_for_supplier(
         self,
@@ -168,63 +320,78 @@ class DocupipeClient:
         """
         route = get_route(supplier)
 
-        if not route:
-            return UploadResult(
-                success=False,
-                supplier=supplier,
-                filename=file_path.name,
-                message=f"No API route configured for supplier: {supplier}"
-            )
-
-        if not route.enabled:
-            return UploadResult(
-                success=False,
-                supplier=supplier,
-                filename=file_path.name,
-                message=f"API route for {supplier} is disabled"
-            )
-
-        if route.provider != 'docupipe':
-            return UploadResult(
-                success=False,
-                supplier=supplier,
-                filename=file_path.name,
-                message=f"Supplier {supplier} uses provider '{route.provider}', not docupipe"
-            )
+        error = route_error(route, supplier, PROVIDER_DOCUPIPE)
+        if error:
+            return self._fail(file_path.name, error, supplier=supplier)
 
         result = self.upload_document(file_path, workflow_id=route.workflow_id)
-        result.supplier = supplier
-
-        return result
+        return replace(result, supplier=supplier)
 
     def get_job_status(self, job_id: str) -> Optional[dict]:
         """
         Check the processing status of a job.
 
+        Finished jobs (see TERMINAL_JOB_STATUSES) are answered from cache;
+        other statuses are reused for JOB_STATUS_TTL seconds, so tight
+        polling loops do not hit the API on every call. At most
+        JOB_STATUS_CACHE_SIZE statuses are kept.
+
         Args:
             job_id: Job ID returned from upload
 
         Returns:
             Job status dict or None if failed
         """
-        if not self.api_key:
+        with self._status_cache_lock:
+            cached = self._status_cache.get(job_id)
+            if cached is not None:
+                self._status_cache.move_to_end(job_id)
+        if cached is not None:
+            fetched_at, status = cached
+            if (status.get('status') in self.TERMINAL_JOB_STATUSES
+                    or time.monotonic() - fetched_at < self.JOB_STATUS_TTL):
+                # Callers get their own copy, so changes don't leak into the cache
+                return copy.deepcopy(status)
+
+        if not self.api_key or not self._breaker.allow():
             return None
 
         url = f"{self.base_url}/job/{job_id}"
-        headers = {
-            "accept": "application/json",
-            "X-API-Key": self.api_key
-        }
 
         try:
-            response = requests.get(url, headers=headers, timeout=30)
+            response = self.session.get(url, headers=self._status_headers, timeout=30)
+            self._breaker.record(failed=response.status_code in TRANSIENT_STATUSES)
             if response.status_code == 200:
-                return response.json()
+                status = response.json()
+                with self._status_cache_lock:
+                    self._status_cache[job_id] = (time.monotonic(), status)
+                    self._status_cache.move_to_end(job_id)
+                    if len(self._status_cache) > self.JOB_STATUS_CACHE_SIZE:
+                        self._status_cache.popitem(last=False)
+                return copy.deepcopy(status)
+        except requests.exceptions.RequestException as e:
+            self._breaker.record(failed=True)
+            logger.error("Failed to get job status: %s", e)
         except Exception as e:
-            logger.error(f"Failed to get job status: {e}")
+            logger.error("Failed to get job status: %s", e)
 
         return None
 
+    def get_job_statuses(self, job_ids: Iterable[str], max_workers: int = UPLOAD_CONCURRENCY) -> dict[str, Optional[dict]]:
+        """
+        Check the processing status of several jobs concurrently.
+
+        Args:
+            job_ids: Job IDs returned from uploads
+            max_workers: Maximum number of status requests in flight at once
+
+        Returns:
+            Dict mapping each job ID to its status dict (None if the check failed)
+        """
+        job_ids = list(job_ids)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(zip(job_ids, executor.map(self.get_job_status, job_ids)))
+
 
 # Convenience function
 def upload_receipt(file_path: Path, supplier: str) -> UploadResult:
@@ -240,3 +407,25 @@ def upload_receipt(file_path: Path, supplier: str) -> UploadResult:
     """
     client = DocupipeClient()
     return client.upload_for_supplier(file_path, supplier)
+
+
+def upload_receipts_batch(
+    files_and_suppliers: Iterable[tuple[Path, str]],
+    max_workers: int = UPLOAD_CONCURRENCY,
+) -> list[UploadResult]:
+    """
+    Upload many receipts to Docupipe, several at a time.
+
+    Uploads are network-bound, so they run in a thread pool sharing one
+    client (and its pooled connections).
+
+    Args:
+        files_and_suppliers: (file path, classified supplier name) pairs
+        max_workers: Maximum number of uploads in flight at once
+
+    Returns:
+        UploadResult for each pair, in input order
+    """
+    client = DocupipeClient()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda pair: client.upload_for_supplier(*pair), files_and_suppliers))
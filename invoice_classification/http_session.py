@@ -0,0 +1,180 @@
+"""
+HTTP Session Setup
+
+Shared requests session configuration for the OCR API clients.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterator
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# HTTP statuses that signal a transient, server-side failure
+TRANSIENT_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Statuses that mean the server turned a request away without processing it,
+# so an upload (POST) can be sent again without creating a duplicate document.
+# A 500/502/504 may arrive after the upload was already accepted.
+UPLOAD_RETRY_STATUSES = frozenset({429, 503})
+
+
+class _RetryPolicy(Retry):
+    """Retry policy that retries POST only on UPLOAD_RETRY_STATUSES."""
+
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if method.upper() == 'POST' and status_code not in UPLOAD_RETRY_STATUSES:
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+# Retry transient failures (rate limiting, 5xx, connection errors) with
+# exponential backoff: 1s, 2s, 4s (+ up to 0.5s jitter), capped at 30s.
+# Read errors are not retried and uploads are retried only on 429/503:
+# otherwise the upload may already have been received.
+RETRY_POLICY = _RetryPolicy(
+    total=3,
+    read=0,
+    backoff_factor=1.0,
+    backoff_max=30,
+    backoff_jitter=0.5,
+    status_forcelist=TRANSIENT_STATUSES,
+    allowed_methods=frozenset({'GET', 'POST'}),
+    respect_retry_after_header=True,
+    # Return the last response once retries run out, so callers report the HTTP status
+    raise_on_status=False,
+)
+
+
+# Keep-alive connections kept per host (enough for concurrent uploads)
+POOL_MAXSIZE = 20
+
+# Uploads in flight at once in the batch upload helpers
+UPLOAD_CONCURRENCY = 6
+
+
+def new_session() -> requests.Session:
+    """
+    Create a requests session that retries transient failures.
+
+    Connections are kept alive and pooled, so requests after the first
+    to the same host skip the TCP and TLS handshakes.
+
+    Returns:
+        Session with the retry policy mounted for http and https
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=POOL_MAXSIZE, max_retries=RETRY_POLICY)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+@lru_cache(maxsize=1)
+def shared_session() -> requests.Session:
+    """Process-wide session for clients created without their own."""
+    return new_session()
+
+
+class CircuitBreaker:
+    """
+    Fail fast while an API is down.
+
+    After `threshold` consecutive failed requests the breaker opens and
+    allow() returns False for `reset_after` seconds, so callers skip the
+    request instead of waiting out timeouts and retries. Once that time
+    has passed, a single caller is let through as a probe while the others
+    keep getting False; the probe's success closes the breaker, its
+    failure reopens it. A probe whose outcome is never recorded (e.g. the
+    upload was skipped before sending) gives way to a new probe after
+    another `reset_after` seconds.
+    """
+
+    def __init__(self, threshold: int = 5, reset_after: float = 30.0):
+        """
+        Args:
+            threshold: Consecutive failures that open the breaker
+            reset_after: Seconds to stay open before trying again
+        """
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self._failures = 0
+        self._opened_at = 0.0
+        # A probe request is in flight; the others wait for its outcome
+        self._probing = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Check whether a request may be sent now."""
+        with self._lock:
+            if self._failures < self.threshold:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < self.reset_after:
+                return False
+            if self._probing and now - self._probe_started < self.reset_after:
+                return False
+            self._probing = True
+            self._probe_started = now
+            return True
+
+    def record(self, failed: bool):
+        """Record the outcome of a request."""
+        with self._lock:
+            self._probing = False
+            if not failed:
+                self._failures = 0
+                return
+            self._failures += 1
+            if self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+
+class InFlightUploads:
+    """
+    Files currently being uploaded, so a concurrent duplicate can be skipped.
+
+    A file is identified by its resolved path, size and modification time,
+    so a file that was changed since counts as a new upload.
+    """
+
+    def __init__(self):
+        self._keys: set[tuple[str, int, int]] = set()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def claim(self, file_path: Path) -> Iterator[bool]:
+        """
+        Claim a file for the duration of a with block.
+
+        Args:
+            file_path: File about to be uploaded
+
+        Yields:
+            False if the same file is already being uploaded, otherwise True
+        """
+        try:
+            stat = file_path.stat()
+        except OSError:
+            # Nothing to deduplicate; the upload itself reports the error
+            yield True
+            return
+        key = (str(file_path.resolve()), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if key in self._keys:
+                claimed = False
+            else:
+                self._keys.add(key)
+                claimed = True
+        try:
+            yield claimed
+        finally:
+            if claimed:
+                with self._lock:
+                    self._keys.discard(key)
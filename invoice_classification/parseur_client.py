@@ -6,18 +6,22 @@ API Documentation: https://developer.parseur.com/upload-emails-and-documents-gui
 """
 
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
-from dataclasses import dataclass
+from typing import BinaryIO, Iterable, Iterator, Optional
+from dataclasses import dataclass, replace
 
 import requests
+from urllib3 import encode_multipart_formdata
 
-from api_config import PARSEUR_API_KEY, PARSEUR_BASE_URL, get_route, is_parseur_configured
+from api_config import PARSEUR_BASE_URL, PROVIDER_PARSEUR, get_parseur_key, get_route, is_parseur_configured, route_error
+from http_session import TRANSIENT_STATUSES, UPLOAD_CONCURRENCY, CircuitBreaker, InFlightUploads, shared_session
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class UploadResult:
     """Result of uploading a document to Parseur."""
     success: bool
@@ -28,18 +32,101 @@ class UploadResult:
     response_data: Optional[dict] = None
 
 
+class _MultipartFileBody:
+    """
+    multipart/form-data request body that streams the file from disk.
+
+    requests builds multipart bodies in memory, copying the whole file, and
+    urllib3 sends file-like bodies in 16 KiB reads. This body keeps only the
+    small part headers in memory and yields the file in 1 MiB blocks, each
+    sent with a single sendall(). The length is known up front (sent as
+    Content-Length), and seek(0) rewinds the body so the request can be
+    retried.
+    """
+
+    CHUNK_SIZE = 1 << 20
+
+    def __init__(self, fields: dict, filename: str, file: BinaryIO):
+        """
+        Args:
+            fields: Form fields sent before the file (None values are skipped)
+            filename: File name sent in the file part
+            file: Open binary file to send
+        """
+        # Encode the form with a placeholder for the file contents, then split
+        # around it; the fields are encoded as requests would (str values)
+        placeholder = os.urandom(16).hex().encode()
+        form = [(name, str(value)) for name, value in fields.items() if value is not None]
+        form.append(('file', (filename, placeholder, 'application/pdf')))
+        body, self.content_type = encode_multipart_formdata(form)
+        self._head, self._tail = body.split(placeholder)
+
+        self._file = file
+        self._file_end = len(self._head) + os.fstat(file.fileno()).st_size
+        self._length = self._file_end + len(self._tail)
+        self._position = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[bytes]:
+        # No read(): urllib3 then sends the chunks yielded here as they are
+        while self._position < self._length:
+            chunk = self._read_part(self.CHUNK_SIZE)
+            self._position += len(chunk)
+            yield chunk
+
+    def tell(self) -> int:
+        """Current position in the body."""
+        return self._position
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        """Move the position (used by urllib3 to rewind on retry)."""
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self._length
+        self._position = min(max(offset, 0), self._length)
+        return self._position
+
+    def _read_part(self, size: int) -> bytes:
+        """Read up to size bytes from the body segment at the current position."""
+        position = self._position
+        head_length = len(self._head)
+        if position < head_length:
+            return self._head[position:position + size]
+        if position >= self._file_end:
+            offset = position - self._file_end
+            return self._tail[offset:offset + size]
+        self._file.seek(position - head_length)
+        return self._file.read(min(size, self._file_end - position))
+
+
 class ParseurClient:
     """Client for interacting with Parseur API."""
 
-    def __init__(self, api_key: Optional[str] = None):
+    # Shared by all clients in the process: trips while the Parseur API is down
+    _breaker = CircuitBreaker()
+    # Shared by all clients in the process: files being uploaded right now
+    _inflight = InFlightUploads()
+
+    def __init__(self, api_key: Optional[str] = None, session: Optional[requests.Session] = None):
         """
         Initialize Parseur client.
 
         Args:
             api_key: Parseur API key. If not provided, uses PARSEUR_API_KEY env var.
+            session: HTTP session to send requests with. If not provided, uses the
+                process-wide session, so connections are reused across clients.
         """
-        self.api_key = api_key or PARSEUR_API_KEY
+        self.api_key = api_key or get_parseur_key()
         self.base_url = PARSEUR_BASE_URL
+        # Keep-alive connections; retries transient failures with backoff
+        self.session = session or shared_session()
+        # Built once; requests merges them per call without modifying them
+        self._headers = {
+            "Authorization": self.api_key
+        }
 
         if not self.api_key:
             logger.warning("Parseur API key not configured. Set PARSEUR_API_KEY environment variable.")
@@ -48,6 +135,26 @@ class ParseurClient:
         """Check if API key is configured."""
         return bool(self.api_key)
 
+    def close(self):
+        """
+        Release the client.
+
+        The HTTP session is left open: it is either the process-wide one,
+        still in use by other clients and upload threads, or the caller's,
+        who closes it.
+        """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def _fail(filename: str, mailbox_id: str, message: str, supplier: str = '') -> UploadResult:
+        """Build the result of a failed upload."""
+        return UploadResult(success=False, supplier=supplier, mailbox_id=mailbox_id, filename=filename, message=message)
+
     def upload_document(
         self,
         file_path: Path,
@@ -66,37 +173,36 @@ class ParseurClient:
             UploadResult with success status and details
         """
         if not self.api_key:
-            return UploadResult(
-                success=False,
-                supplier='',
-                mailbox_id=mailbox_id,
-                filename=file_path.name,
-                message="Parseur API key not configured"
-            )
+            return self._fail(file_path.name, mailbox_id, "Parseur API key not configured")
 
-        url = f"{self.base_url}/parser/{mailbox_id}/upload"
+        if not self._breaker.allow():
+            return self._fail(file_path.name, mailbox_id, "Parseur API unavailable (circuit open), upload skipped")
 
-        headers = {
-            "Authorization": self.api_key
-        }
+        with self._inflight.claim(file_path) as claimed:
+            if not claimed:
+                return self._fail(file_path.name, mailbox_id, "Upload of this file already in progress")
+            return self._upload_document(file_path, mailbox_id, custom_params)
+
+    def _upload_document(self, file_path: Path, mailbox_id: str, custom_params: Optional[dict]) -> UploadResult:
+        """Send a document to a Parseur mailbox (see upload_document)."""
+        url = f"{self.base_url}/parser/{mailbox_id}/upload"
 
         try:
             with open(file_path, 'rb') as f:
-                files = {'file': (file_path.name, f, 'application/pdf')}
-
                 # Add custom parameters as form fields if provided
-                data = custom_params or {}
+                body = _MultipartFileBody(custom_params or {}, file_path.name, f)
 
-                response = requests.post(
+                response = self.session.post(
                     url,
-                    headers=headers,
-                    files=files,
-                    data=data,
+                    headers={**self._headers, 'Content-Type': body.content_type},
+                    data=body,
                     timeout=60
                 )
 
+            self._breaker.record(failed=response.status_code in TRANSIENT_STATUSES)
+
             if response.status_code in (200, 201, 202):
-                logger.info(f"Uploaded {file_path.name} to mailbox {mailbox_id}")
+                logger.info("Uploaded %s to mailbox %s", file_path.name, mailbox_id)
                 return UploadResult(
                     success=True,
                     supplier='',
@@ -107,39 +213,17 @@ class ParseurClient:
                 )
             else:
                 error_msg = f"HTTP {response.status_code}: {response.text}"
-                logger.error(f"Failed to upload {file_path.name}: {error_msg}")
-                return UploadResult(
-                    success=False,
-                    supplier='',
-                    mailbox_id=mailbox_id,
-                    filename=file_path.name,
-                    message=error_msg
-                )
+                logger.error("Failed to upload %s: %s", file_path.name, error_msg)
+                return self._fail(file_path.name, mailbox_id, error_msg)
 
         except requests.exceptions.Timeout:
-            return UploadResult(
-                success=False,
-                supplier='',
-                mailbox_id=mailbox_id,
-                filename=file_path.name,
-                message="Request timed out"
-            )
+            self._breaker.record(failed=True)
+            return self._fail(file_path.name, mailbox_id, "Request timed out")
         except requests.exceptions.RequestException as e:
-            return UploadResult(
-                success=False,
-                supplier='',
-                mailbox_id=mailbox_id,
-                filename=file_path.name,
-                message=f"Request failed: {str(e)}"
-            )
+            self._breaker.record(failed=True)
+            return self._fail(file_path.name, mailbox_id, f"Request failed: {str(e)}")
         except Exception as e:
-            return UploadResult(
-                success=False,
-                supplier='',
-                mailbox_id=mailbox_id,
-                filename=file_path.name,
-                message=f"Unexpected error: {str(e)}"
-            )
+            return self._fail(file_path.name, mailbox_id, f"Unexpected error: {str(e)}")
 
     def upload_for_supplier(
         self,
@@ -160,50 +244,18 @@ class ParseurClient:
         """
         route = get_route(supplier)
 
-        if not route:
-            return UploadResult(
-                success=False,
-                supplier=supplier,
-                mailbox_id='',
-                filename=file_path.name,
-                message=f"No API route configured for supplier: {supplier}"
-            )
-
-        if not route.enabled:
-            return UploadResult(
-                success=False,
-                supplier=supplier,
-                mailbox_id=route.mailbox_id or '',
-                filename=file_path.name,
-                message=f"API route for {supplier} is disabled (provider: {route.provider})"
-            )
-
-        if route.provider != 'parseur':
-            return UploadResult(
-                success=False,
-                supplier=supplier,
-                mailbox_id='',
-                filename=file_path.name,
-                message=f"Provider '{route.provider}' not implemented yet"
-            )
-
-        if not route.mailbox_id:
-            return UploadResult(
-                success=False,
-                supplier=supplier,
-                mailbox_id='',
-                filename=file_path.name,
-                message=f"No mailbox ID configured for supplier: {supplier}"
-            )
+        error = route_error(route, supplier, PROVIDER_PARSEUR)
+        if not error and not route.mailbox_id:
+            error = f"No mailbox ID configured for supplier: {supplier}"
+        if error:
+            return self._fail(file_path.name, (route.mailbox_id or '') if route else '', error, supplier=supplier)
 
         # Add supplier info to custom params
         params = custom_params or {}
         params['supplier'] = supplier
 
         result = self.upload_document(file_path, route.mailbox_id, params)
-        result.supplier = supplier
-
-        return result
+        return replace(result, supplier=supplier)
 
 
 # Convenience function
@@ -220,3 +272,25 @@ def upload_invoice(file_path: Path, supplier: str) -> UploadResult:
     """
     client = ParseurClient()
     return client.upload_for_supplier(file_path, supplier)
+
+
+def upload_invoices_batch(
+    files_and_suppliers: Iterable[tuple[Path, str]],
+    max_workers: int = UPLOAD_CONCURRENCY,
+) -> list[UploadResult]:
+    """
+    Upload many invoices to Parseur, several at a time.
+
+    Uploads are network-bound, so they run in a thread pool sharing one
+    client (and its pooled connections).
+
+    Args:
+        files_and_suppliers: (file path, classified supplier name) pairs
+        max_workers: Maximum number of uploads in flight at once
+
+    Returns:
+        UploadResult for each pair, in input order
+    """
+    client = ParseurClient()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda pair: client.upload_for_supplier(*pair), files_and_suppliers))